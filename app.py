@@ -1,22 +1,38 @@
+import importlib
+import os
 import streamlit as st
-from my_page.summary import show as show_summary
-from my_page.processing import show as show_processing
-from my_page.visualization import show as show_visualization
-from my_page.modeling import show as show_modeling
-from my_page.summary_insight import show as show_summary_insight
+from my_utils import instrument, models
+
+# Page label -> module; a page module (and the libraries it imports) is only
+# imported the first time that page is selected. See profile_imports.py for
+# per-page cold import times.
+PAGES = {
+    "1️⃣ Project & Data Summary": 'my_page.summary',
+    "2️⃣ Theory & Processing": 'my_page.processing',
+    "3️⃣ Visualization": 'my_page.visualization',
+    "4️⃣ Modeling & Prediction": 'my_page.modeling',
+    "5️⃣ Summary & Insights": 'my_page.summary_insight'
+}
 
 # Multipage navigation
 def main():
+    # Preload the default prediction pipeline once per process (AQI_WARMUP=0 disables)
+    if os.environ.get('AQI_WARMUP', '1') != '0':
+        models.warm_up()
+
+    # AQI_ADMIN=1 adds the instrumentation panel (spans, cache hits, exports) to the sidebar
+    admin = os.environ.get('AQI_ADMIN') == '1'
+
     st.sidebar.title("🗂️ Navigation")
-    pages = {
-        "1️⃣ Project & Data Summary": show_summary,
-        "2️⃣ Theory & Processing": show_processing,
-        "3️⃣ Visualization": show_visualization,
-        "4️⃣ Modeling & Prediction": show_modeling,
-        "5️⃣ Summary & Insights": show_summary_insight
-    }
-    choice = st.sidebar.radio("Go to", list(pages.keys()))
-    pages[choice]()
+    choice = st.sidebar.radio("Go to", list(PAGES.keys()))
+    instrument.start_run(PAGES[choice])
+    try:
+        with instrument.span(PAGES[choice]):
+            importlib.import_module(PAGES[choice]).show()
+    finally:
+        run = instrument.end_run()
+    if admin:
+        importlib.import_module('my_page.admin').sidebar_panel(run)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
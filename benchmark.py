@@ -0,0 +1,333 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+# Offline benchmark suite for the dashboard, run against the Data_set/ and
+# Models/ artifacts:
+#
+#   pages    cold (first selection in a fresh process) and warm (rerun) render
+#            time of every page, via Streamlit's headless AppTest
+#   data     load time of every dataset through my_utils.data, and the plain CSV parse
+#   models   unpickling time of every artifact in Models/
+#   predict  single-row latency and batch throughput of every *_best.pkl pipeline
+#   flat     flat-array tree models (my_utils/flattrees.py) against model.predict
+#
+# Results, including peak RSS, are written as JSON. The run exits with status 1
+# if a page crashes or raises. With --baseline it also does so if any timing (or
+# peak RSS) is worse than the baseline by more than --threshold, or if a metric
+# of a section that was run is missing from the results.
+#
+#   python benchmark.py --out bench.json
+#   python benchmark.py --out new.json --baseline bench.json --threshold 0.5
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+WARM_RUNS = 3
+LOAD_RUNS = 5
+
+# Single-shot metrics that are reported but too noisy to fail a run on
+UNGATED = {'first_call_ms', 'boot_ms'}
+SINGLE_CALLS = 50
+BATCH_ROWS = 100_000
+BATCH_RUNS = 5
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def _median_time(fn, runs, setup=None):
+    times = []
+    for _ in range(runs):
+        if setup is not None:
+            setup()
+        times.append(_timed(fn)[0])
+    return statistics.median(times)
+
+
+# --- pages -----------------------------------------------------------------
+
+def _page_worker(label, warm_runs):
+    """Runs in a fresh process: render one page cold, then warm; prints JSON."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(BASE_DIR, 'app.py'), default_timeout=600)
+    boot, _ = _timed(at.run)
+    if at.sidebar.radio[0].value == label:
+        # The app opens on the first page, so its cold render is the boot run
+        cold = boot
+    else:
+        cold, _ = _timed(lambda: at.sidebar.radio[0].set_value(label).run())
+    warm = [_timed(at.run)[0] for _ in range(warm_runs)]
+    print(json.dumps({
+        'boot_ms': _ms(boot),
+        'cold_ms': _ms(cold),
+        'warm_ms': _ms(statistics.median(warm)),
+        'exceptions': [str(e.value) for e in at.exception],
+        'peak_rss_mb': _peak_rss_mb(),
+    }))
+
+
+def bench_pages(warm_runs=WARM_RUNS):
+    from app import PAGES
+
+    env = dict(os.environ, AQI_WARMUP='0')
+    results = {}
+    for label, module in PAGES.items():
+        proc = subprocess.run(
+            [sys.executable, __file__, '--page-worker', label, '--warm-runs', str(warm_runs)],
+            cwd=BASE_DIR, env=env, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            last = proc.stderr.strip().splitlines()[-1:]
+            results[module] = {'error': last[0] if last else f'exit status {proc.returncode}'}
+            continue
+        results[module] = json.loads(proc.stdout.strip().splitlines()[-1])
+    return results
+
+
+# --- data and models -------------------------------------------------------
+
+def bench_data(runs=LOAD_RUNS):
+    import pandas as pd
+    from my_utils import data
+
+    results = {}
+    for name, (file_name, kwargs) in data.DATASETS.items():
+        path = data.data_path(name)
+        try:
+            data.signature(name)
+        except FileNotFoundError:
+            continue
+        # Uncached load, the way a fresh process reads it (columnar copy when fresh)
+        load_s = _median_time(lambda: data.load(name), runs, setup=lambda: data.clear_cache(name))
+        row = {'rows': int(len(data.load(name))), 'load_ms': _ms(load_s)}
+        if os.path.exists(path):
+            row['csv_ms'] = _ms(_median_time(lambda: pd.read_csv(path, **kwargs), runs))
+        results[name] = row
+    return results
+
+
+def bench_models(runs=LOAD_RUNS):
+    import joblib
+    from my_utils import models
+
+    paths = models.artifact_paths()
+    # One untimed pass pulls in the scikit-learn modules the pickles need,
+    # so each timing below is the unpickling alone
+    for path in paths.values():
+        joblib.load(path)
+    return {
+        name: {'load_ms': _ms(_median_time(lambda: joblib.load(path), runs)),
+               'size_kb': round(os.path.getsize(path) / 1024, 1)}
+        for name, path in paths.items()
+    }
+
+
+def _sample_rows(n, seed=0):
+    """``n`` plausible readings: training medians with multiplicative noise on the form inputs."""
+    import numpy as np
+    import pandas as pd
+    from my_utils import predict
+
+    medians = predict.feature_medians()
+    frame = pd.DataFrame(np.tile(medians.to_numpy(), (n, 1)), columns=medians.index)
+    rng = np.random.default_rng(seed)
+    for col in predict.INPUT_FEATURES:
+        if col in frame.columns:
+            frame[col] *= rng.lognormal(0.0, 0.3, n)
+    return frame
+
+
+def bench_predict(single_calls=SINGLE_CALLS, batch_rows=BATCH_ROWS, batch_runs=BATCH_RUNS):
+    from my_utils import models, predict
+
+    one = _sample_rows(1)
+    batch = _sample_rows(batch_rows)
+    results = {}
+    for name in models.available_models():
+        first_s, _ = _timed(lambda: predict.predict_batch(one, name))
+        single = [_timed(lambda: predict.predict_batch(one, name))[0] for _ in range(single_calls)]
+        batches = [_timed(lambda: predict.predict_batch(batch, name))[0] for _ in range(batch_runs)]
+        single_s, batch_s = statistics.median(single), statistics.median(batches)
+        results[name] = {
+            'first_call_ms': _ms(first_s),
+            'single_ms': _ms(single_s),
+            'single_rows_per_s': round(1 / single_s, 1),
+            'batch_ms': _ms(batch_s),
+            'batch_rows_per_s': round(batch_rows / batch_s, 1),
+        }
+    return results
+
+
+def bench_flat(single_calls=SINGLE_CALLS, batch_rows=BATCH_ROWS, runs=LOAD_RUNS):
+    import joblib
+    import numpy as np
+    from my_utils import flattrees, models, predict
+
+    X = predict.prepare_features(_sample_rows(batch_rows))
+    one = X.iloc[:1]
+    paths = models.artifact_paths()
+    results = {}
+    for name in flattrees.available():
+        flat_dir = flattrees.export(name)
+        pipeline = models.get_pipeline(name)
+        flat = flattrees.FlatTrees(flat_dir)
+        sources = [paths['scaler'], paths['selector'], paths[f'{name}_best']]
+        flat_single = _median_time(lambda: flat.predict(one), single_calls)
+        sk_single = _median_time(lambda: pipeline.predict(one), single_calls)
+        flat_batch = _median_time(lambda: flat.predict(X), runs)
+        sk_batch = _median_time(lambda: pipeline.predict(X), runs)
+        results[name] = {
+            'trees': flat.meta['trees'],
+            'max_abs_diff': float(np.max(np.abs(flat.predict(X) - pipeline.predict(X)))),
+            'flat_load_ms': _ms(_median_time(lambda: flattrees.FlatTrees(flat_dir), runs)),
+            'pickle_load_ms': _ms(_median_time(lambda: [joblib.load(p) for p in sources], runs)),
+            'flat_single_ms': _ms(flat_single),
+            'sklearn_single_ms': _ms(sk_single),
+            'flat_batch_ms': _ms(flat_batch),
+            'flat_batch_rows_per_s': round(batch_rows / flat_batch, 1),
+            'sklearn_batch_ms': _ms(sk_batch),
+            'sklearn_batch_rows_per_s': round(batch_rows / sk_batch, 1),
+        }
+    return results
+
+
+# --- report and regression check -------------------------------------------
+
+def run(sections):
+    report = {'meta': {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }}
+    benches = {'data': bench_data, 'models': bench_models, 'predict': bench_predict,
+               'flat': bench_flat, 'pages': bench_pages}
+    for section in sections:
+        report[section] = benches[section]()
+    report['peak_rss_mb'] = _peak_rss_mb()
+    return report
+
+
+def _metrics(report, prefix=''):
+    """Flatten to {'section.name.metric': value} for the numeric leaves."""
+    flat = {}
+    for key, value in report.items():
+        if key == 'meta':
+            continue
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(_metrics(value, path + '.'))
+        elif isinstance(value, (int, float)):
+            flat[path] = value
+    return flat
+
+
+def failures(report):
+    """Messages for pages whose worker crashed or whose render raised."""
+    found = []
+    for module, result in report.get('pages', {}).items():
+        if 'error' in result:
+            found.append(f"{module} crashed: {result['error']}")
+        for exc in result.get('exceptions', []):
+            found.append(f"{module} raised: {exc}")
+    return found
+
+
+def regressions(report, baseline, threshold, min_ms=10.0):
+    """[(metric, baseline, current)] worse than ``baseline`` by more than ``threshold``.
+
+    Times and peak RSS regress upwards, throughputs downwards; timings below
+    ``min_ms`` in both runs (and throughputs derived from them) are treated as noise.
+    A baseline metric missing from a section that was run is reported with
+    current None (a page that crashed, a dataset or model that went away).
+    """
+    current, before = _metrics(report), _metrics(baseline)
+
+    def below_floor(key):
+        return max(before.get(key, 0), current.get(key, 0)) < min_ms
+
+    found = []
+    for key, old in before.items():
+        new = current.get(key)
+        if new is None:
+            if key.split('.', 1)[0] in report:
+                found.append((key, old, None))
+            continue
+        if not old or key.rsplit('.', 1)[-1] in UNGATED:
+            continue
+        if key.endswith('_ms') or key.endswith('_mb'):
+            if key.endswith('_ms') and below_floor(key):
+                continue
+            worse = new > old * (1 + threshold)
+        elif key.endswith('_rows_per_s'):
+            if below_floor(key[:-len('_rows_per_s')] + '_ms'):
+                continue
+            worse = new < old / (1 + threshold)
+        else:
+            continue
+        if worse:
+            found.append((key, old, new))
+    return found
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Dashboard performance benchmarks")
+    parser.add_argument('--out', default='benchmark.json', help="where to write the JSON results")
+    parser.add_argument('--sections', nargs='+', default=['data', 'models', 'predict', 'flat', 'pages'],
+                        choices=['data', 'models', 'predict', 'flat', 'pages'])
+    parser.add_argument('--baseline', help="earlier results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.5,
+                        help="allowed relative slowdown before failing (default 0.5 = 50%%)")
+    parser.add_argument('--min-ms', type=float, default=10.0,
+                        help="ignore timings below this in both runs (noise floor)")
+    parser.add_argument('--warm-runs', type=int, default=WARM_RUNS)
+    parser.add_argument('--page-worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.page_worker:
+        _page_worker(args.page_worker, args.warm_runs)
+        sys.exit(0)
+
+    report = run(args.sections)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"Wrote {args.out} (peak RSS {report['peak_rss_mb']} MB)")
+
+    failed = failures(report)
+    for message in failed:
+        print(f"FAILED {message}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        found = regressions(report, baseline, args.threshold, args.min_ms)
+        for key, old, new in found:
+            if new is None:
+                print(f"MISSING {key}: {old} -> not measured")
+            else:
+                print(f"REGRESSION {key}: {old} -> {new}")
+        if found:
+            failed.append('regressions')
+        else:
+            print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,57 @@
+import streamlit as st
+import pandas as pd
+from my_utils import instrument, st_compat
+
+# Sidebar panel for operators (shown when AQI_ADMIN=1): where the last rerun
+# spent its time, cache hits and misses, and the process totals as JSON or
+# Prometheus text.
+
+def _span_table(run):
+    rows = []
+    # Spans are recorded as they finish; list them by start so parents come first
+    for s in sorted(run.spans, key=lambda s: s['start']):
+        row = {'span': '  ' * s['depth'] + s['name'], 'ms': round(s['seconds'] * 1000, 1)}
+        if 'alloc_bytes' in s:
+            row['alloc KB'] = round(s['alloc_bytes'] / 1024, 1)
+            row['peak KB'] = round(s['peak_bytes'] / 1024, 1)
+        rows.append(row)
+    return pd.DataFrame(rows) if rows else pd.DataFrame(columns=['span', 'ms'])
+
+
+def _cache_table(run):
+    counts = {}
+    for (cache, result), n in run.cache.items():
+        counts.setdefault(cache, {'hit': 0, 'miss': 0})[result] = n
+    return pd.DataFrame.from_dict(counts, orient='index', columns=['hit', 'miss'])
+
+
+def _toggle_tracing():
+    instrument.set_tracing(st.session_state['admin_tracemalloc'])
+
+
+def sidebar_panel(run):
+    with st.sidebar.expander("🔧 Instrumentation"):
+        # Tracing is process-wide; the checkbox shows the process state, so a
+        # session only changes it by clicking, never by rerunning
+        st.session_state['admin_tracemalloc'] = instrument.tracing()
+        st.checkbox(
+            "Trace allocations (tracemalloc)", key='admin_tracemalloc',
+            on_change=_toggle_tracing,
+            help="Adds net and peak allocation per span for every session of this "
+                 "server; slows the app down noticeably while on. AQI_TRACEMALLOC=1 "
+                 "turns it on at startup."
+        )
+        if run is None:
+            return
+        st.caption(f"Last rerun: {run.label}, {run.seconds * 1000:.0f} ms")
+        st_compat.dataframe(_span_table(run))
+        if run.cache:
+            st.dataframe(_cache_table(run))
+        st.download_button(
+            "Metrics (JSON)", data=instrument.to_json(),
+            file_name='aqi_metrics.json', mime='application/json'
+        )
+        st.download_button(
+            "Metrics (Prometheus)", data=instrument.to_prometheus(),
+            file_name='aqi_metrics.prom', mime='text/plain'
+        )
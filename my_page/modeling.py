@@ -1,9 +1,42 @@
+import os
 import streamlit as st
 import pandas as pd
-import joblib
 import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm
 import seaborn as sns
-import os
+from my_utils import data, figcache, instrument, models, plotting, predict, st_compat, stats, streaming
+
+# Seconds between live stream refreshes
+STREAM_REFRESH_S = 2
+
+
+def _actual_vs_pred_fig(model_name, render, budget):
+    preds = data.load_predictions()
+    actual, pred = preds['Actual'], preds[f"{model_name}_Pred"]
+    fig, ax = plt.subplots(figsize=(4,4))
+    if render == "Density":
+        counts, edges = plotting.prediction_density()[model_name]
+        ax.pcolormesh(edges, edges, counts.T, norm=LogNorm(), cmap='viridis')
+    elif render == "Sampled points":
+        rows = plotting.prediction_sample(budget)
+        ax.scatter(actual.to_numpy()[rows], pred.to_numpy()[rows], s=8, alpha=0.5)
+    else:
+        sns.scatterplot(x=actual, y=pred, alpha=0.5, ax=ax)
+    lo, hi = actual.min(), actual.max()
+    ax.plot([lo, hi], [lo, hi], 'r--')
+    ax.set_xlabel("Actual AQI")
+    ax.set_ylabel("Predicted AQI")
+    ax.set_title(model_name)
+    return fig
+
+
+def _error_fig(perf):
+    fig, ax = plt.subplots(figsize=(8,4))
+    perf[['RMSE','MAE','MAPE_%']].plot.bar(ax=ax)
+    ax.set_xlabel("Model")
+    ax.set_ylabel("Error")
+    return fig
+
 
 def show():
     st.title("🤖 Modeling & Prediction")
@@ -16,9 +49,7 @@ def show():
     )
 
     # 1) Performance table
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    csv_path = os.path.join(BASE_DIR, '..', 'Data_set', 'model_performance_tuned.csv')
-    perf = pd.read_csv(csv_path, index_col=0)
+    perf = data.load_performance()
     st.subheader("📊 Model Performance")
     st.dataframe(
         perf.style.format({'R2':'{:.3f}','RMSE':'{:.2f}','MAE':'{:.2f}','MAPE_%':'{:.2f}%'}),
@@ -27,25 +58,34 @@ def show():
 
     # 2) Actual vs Predicted AQI
     st.subheader("🔍 Actual vs Predicted AQI")
-    csv_path = os.path.join(BASE_DIR, '..', 'Data_set', 'model_predictions_tuned.csv')
-    preds  = pd.read_csv(csv_path)
-    actual = preds['Actual']
     st.markdown(
         """
-        Scatter plots compare each model’s predictions (y-axis) to the true AQI values (x-axis).
-        Red dashed line = perfect prediction.
+        Each chart compares a model’s predictions (y-axis) to the true AQI values (x-axis)
+        over all ~30k test rows. Red dashed line = perfect prediction.
         """
     )
+    render = st.radio(
+        "Rendering",
+        ["Density", "Sampled points", "All points"],
+        horizontal=True,
+        help="Density bins every test row into a 2-D histogram (brighter = more rows, "
+             "log scale); sampled points draws a stratified sample of the rows; "
+             "all points draws every row (slowest)."
+    )
+    budget = None
+    if render == "Sampled points":
+        budget = st.slider("Point budget", 500, 10000, plotting.DEFAULT_POINT_BUDGET, step=500)
+
+    # Charts are served from the figure cache, keyed on the rendering and the
+    # predictions file, so a rerun re-encodes none of them
+    version = figcache.data_version('model_predictions')
     for model_name in perf.index:
-        pred = preds[f"{model_name}_Pred"]
-        fig, ax = plt.subplots(figsize=(4,4))
-        sns.scatterplot(x=actual, y=pred, alpha=0.5, ax=ax)
-        ax.plot([actual.min(), actual.max()],
-                [actual.min(), actual.max()], 'r--')
-        ax.set_xlabel("Actual AQI")
-        ax.set_ylabel("Predicted AQI")
-        ax.set_title(model_name)
-        st.pyplot(fig, use_container_width=True)
+        with instrument.span(f'modeling.actual_vs_pred.{model_name}'):
+            image = figcache.cached_figure(
+                'actual_vs_pred', {'model': model_name, 'render': render, 'budget': budget},
+                version, lambda: _actual_vs_pred_fig(model_name, render, budget)
+            )
+            st_compat.image(image)
         st.markdown(
             f"• **{model_name}** → R² {perf.at[model_name,'R2']:.3f}, "
             f"RMSE {perf.at[model_name,'RMSE']:.2f}, MAE {perf.at[model_name,'MAE']:.2f}, "
@@ -55,100 +95,202 @@ def show():
 
     # 3) Error comparison
     st.subheader("📈 Error Comparison")
-    fig2, ax2 = plt.subplots(figsize=(8,4))
-    perf[['RMSE','MAE','MAPE_%']].plot.bar(ax=ax2)
-    ax2.set_xlabel("Model")
-    ax2.set_ylabel("Error")
-    st.pyplot(fig2, use_container_width=True)
+    with instrument.span('modeling.error_comparison'):
+        image = figcache.cached_figure(
+            'error_comparison', {}, figcache.data_version('model_performance'),
+            lambda: _error_fig(perf)
+        )
+        st_compat.image(image)
 
     # 4) Live AQI Prediction
     st.subheader("🚀 Live AQI Prediction")
     st.markdown("Select a model, then enter values for the 9 pollutant & meteorology features.")
 
-    # Load cleaned data & artifacts
-    csv_path = os.path.join(BASE_DIR, '..', 'Data_set', 'merged_data_eda.csv')
-    df_eda   = pd.read_csv(csv_path, parse_dates=['DATETIME'], index_col='DATETIME')
-    pkl_path = os.path.join(BASE_DIR, '..', 'Models', 'scaler.pkl')
-    scaler   = joblib.load(pkl_path)
-    pkl_path = os.path.join(BASE_DIR, '..', 'Models', 'selector.pkl')
-    selector = joblib.load(pkl_path)
-
-    # --- Ensure all code columns exist exactly as during training ---
-    # Encode wind direction
-    df_eda['WD_code']      = df_eda['WD'].astype('category').cat.codes
-    # Encode station
-    df_eda['STATION_code'] = df_eda['STATION'].astype('category').cat.codes
-    # Encode seasons
-    df_eda['SEASONS_code'] = df_eda['SEASONS'].astype('category').cat.codes
-    # Encode AQI category
-    df_eda['AQI_Category_code'] = df_eda['AQI_Category'].astype('category').cat.codes
-
-    # Grab the exact list of features seen by the scaler
-    full_cols = list(scaler.feature_names_in_)
-
-    # Fixed input features (drop 'AQI_Category_code')
-    input_feats = [
-        'PM2.5','PM10','SO2','NO2','CO',
-        'O3','DEWP','WSPM','Vehicular_Pollution'
-    ]
-
-    # 4-A) Model selection
-    model_choice = st.selectbox("Model", perf.index.tolist())
-    model = joblib.load(os.path.join(BASE_DIR, '..', 'Models',f"{model_choice}_best.pkl"))
-
-    st.markdown(f"**Enter values for:** {', '.join(input_feats)}")
-
-    # 4-B) Build the input form
-    with st.form("predict_form"):
-        user_vals = {}
-        for feat in input_feats:
-            mn, mx, md = df_eda[feat].min(), df_eda[feat].max(), df_eda[feat].median()
-            user_vals[feat] = st.number_input(
-                label=feat.replace('_',' ').title(),
-                min_value=float(mn),
-                max_value=float(mx),
-                value=float(md)
-            )
-        submitted = st.form_submit_button("Predict")
-
-       # 4-D) On submit, assemble & predict
-    if submitted:
-        # 1) Build a one-row DataFrame matching scaler.feature_names_in_
-        template = pd.DataFrame(
-            {c: [df_eda[c].median()] for c in full_cols},
-            columns=full_cols
+    # Input ranges and defaults come from the precomputed feature stats
+    # (Data_set/feature_stats.json) rather than scanning the hourly data.
+    feat_stats  = stats.load_feature_stats()
+    input_feats = predict.INPUT_FEATURES
+
+    # 4-A) Model selection (only models with a tuned *_best.pkl can predict)
+    available = models.available_models()
+    model_choice = st.selectbox("Model", [m for m in perf.index if m in available])
+    r2 = perf.at[model_choice, 'R2']
+
+    mode = st.radio("Prediction mode", ["Single reading", "Upload CSV"], horizontal=True)
+
+    if mode == "Single reading":
+        station = st.selectbox(
+            "Station (sets default values)",
+            ["All stations"] + list(feat_stats['by_station'])
         )
+        if station == "All stations":
+            defaults = feat_stats['features']
+        else:
+            defaults = feat_stats['by_station'][station]
+        st.markdown(f"**Enter values for:** {', '.join(input_feats)}")
+
+        # 4-B) Build the input form
+        with st.form("predict_form"):
+            user_vals = {}
+            for feat in input_feats:
+                rng = feat_stats['features'][feat]
+                mn, mx, md = rng['min'], rng['max'], defaults[feat]['median']
+                user_vals[feat] = st.number_input(
+                    label=feat.replace('_',' ').title(),
+                    min_value=float(mn),
+                    max_value=float(mx),
+                    value=float(md)
+                )
+            submitted = st.form_submit_button("Predict")
 
-        # 2) Overwrite pollutant entries with user input
-        for k, v in user_vals.items():
-            template[k] = v
-
-        # 3) Scale → select → predict
-        Xs   = scaler.transform(template)
-        Xsel = selector.transform(Xs)
-        ypred = model.predict(Xsel)[0]
-        r2    = perf.at[model_choice, 'R2']
-
-        # 4) Map predicted AQI to its category
-        category_bins   = [0, 50, 100, 150, 200, 300, 500]
-        category_labels = [
-            'Good',
-            'Moderate',
-            'Unhealthy for Sensitive Groups',
-            'Unhealthy',
-            'Very Unhealthy',
-            'Hazardous'
-        ]
-        aqi_cat = pd.cut(
-            [ypred],
-            bins=category_bins,
-            labels=category_labels,
-            right=True,
-            include_lowest=True
-        )[0]
-
-        # 5) Display both AQI and category
-        st.success(
-            f"🌟 Predicted AQI: {ypred:.1f}  |  Model R² = {r2:.3f}\n\n"
-            f"🔖 Category: **{aqi_cat}**"
+        # 4-C) On submit, predict the single row (other features = training medians)
+        if submitted:
+            reading = dict(user_vals)
+            if station != "All stations":
+                reading['STATION'] = station
+            result = predict.predict_batch(pd.DataFrame([reading]), model_choice)
+            ypred   = result['AQI_pred'].iat[0]
+            aqi_cat = result['AQI_Category_pred'].iat[0]
+
+            # Display both AQI and category
+            st.success(
+                f"🌟 Predicted AQI: {ypred:.1f}  |  Model R² = {r2:.3f}\n\n"
+                f"🔖 Category: **{aqi_cat}**"
+            )
+
+    else:
+        # 4-D) Batch mode: score every row of an uploaded CSV in one call
+        st.markdown(
+            "Upload a CSV of station readings. Columns are matched against the features "
+            "the model was trained on; any missing feature is filled with its training median."
         )
+        upload = st.file_uploader("Station readings (CSV)", type="csv")
+        if upload is not None:
+            batch = pd.read_csv(upload)
+            missing, extra = predict.check_columns(batch)
+            if len(missing) == len(predict.feature_names()):
+                st.error(
+                    "No model features found in the file. Expected columns: "
+                    + ", ".join(predict.feature_names())
+                )
+            elif batch.empty:
+                st.info("The file has a header but no readings to score.")
+            else:
+                if missing:
+                    st.info("Filled with training medians: " + ", ".join(missing))
+                if extra:
+                    st.caption("Ignored columns: " + ", ".join(extra))
+
+                result = pd.concat([batch, predict.predict_batch(batch, model_choice)], axis=1)
+                st.success(
+                    f"🌟 Scored {len(result):,} rows with {model_choice}  |  Model R² = {r2:.3f}"
+                )
+                st.dataframe(result.head(1000), height=300)
+                st.bar_chart(result['AQI_Category_pred'].value_counts(sort=False))
+                st.download_button(
+                    label="📥 Download predictions",
+                    data=result.to_csv(index=False).encode('utf-8'),
+                    file_name=f"aqi_predictions_{model_choice}.csv",
+                    mime="text/csv"
+                )
+
+    # 5) Live stream with online learning
+    _live_stream()
+
+
+def _stream_view(stream):
+    # A file without the reading columns is reported once and not polled again
+    if st.session_state.get('stream_error') is None:
+        try:
+            stream.step()
+        except ValueError as e:
+            st.session_state['stream_error'] = str(e)
+    if st.session_state.get('stream_error'):
+        st.error(st.session_state['stream_error'])
+        return
+    m = stream.metrics()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Readings", f"{m['rows']:,}")
+    c2.metric(f"{stream.baseline} MAE (frozen)",
+              "–" if m['baseline_mae'] is None else f"{m['baseline_mae']:.2f}")
+    c3.metric("SGD MAE (online)", "–" if m['online_mae'] is None else f"{m['online_mae']:.2f}")
+    c4.metric("Alerts", m['alerts'])
+
+    # New threshold crossings since the last refresh pop up as toasts (newest few;
+    # inline warnings on Streamlit versions without st.toast)
+    seen = st.session_state.get('stream_alerts_seen', 0)
+    new = min(m['alerts'] - seen, 3, len(stream.alerts))
+    for alert in list(stream.alerts)[len(stream.alerts) - new:]:
+        st_compat.toast(f"⚠️ {alert['STATION']}: AQI {alert['AQI']:.0f} crossed {alert['level']} "
+                        f"({alert['category']}) at {alert['DATETIME']:%Y-%m-%d %H:%M}")
+    st.session_state['stream_alerts_seen'] = m['alerts']
+
+    recent = stream.frame()
+    if recent.empty:
+        st.info("Waiting for readings…")
+        return
+    station = st.selectbox("Station", sorted(recent['STATION'].unique()), key='stream_station')
+    view = recent[recent['STATION'] == station][['AQI', 'Baseline_Pred', 'Online_Pred']]
+    st.line_chart(view.rename(columns={
+        'Baseline_Pred': f"{stream.baseline} (frozen)", 'Online_Pred': "SGD (online)"
+    }))
+    if stream.alerts:
+        st_compat.dataframe(pd.DataFrame(list(stream.alerts)[::-1]), height=200)
+    if stream.source.done:
+        st.caption("Replay finished.")
+
+
+def _live_stream():
+    st.subheader("📡 Live Stream")
+    st.markdown(
+        f"""
+        Hourly station readings are scored as they arrive by the frozen **{streaming.BASELINE_MODEL}**
+        model and by an **online SGD regressor** that first predicts each batch and then
+        learns from it. An alert is raised when a station's AQI rises past
+        {", ".join(str(level) for level in streaming.ALERT_LEVELS)}. Only the latest
+        {streaming.BUFFER_ROWS:,} readings and {streaming.MAX_ALERTS} alerts are kept.
+        """
+    )
+    if not st.checkbox("Run live stream", key='stream_on'):
+        return
+
+    kind = st.radio("Source", ["Replay history", "Follow a CSV file"], horizontal=True,
+                    key='stream_kind')
+    if kind == "Replay history":
+        speed = st.slider("Replay speed (simulated hours per second)", 1, 48, 6, key='stream_speed')
+        config = (kind, speed)
+    else:
+        stream_dir = os.path.realpath(streaming.STREAM_DIR)
+        name = st.text_input(f"CSV file under {stream_dir} that the station feed appends to",
+                             key='stream_path')
+        from_start = st.checkbox("Read the rows already in the file", key='stream_from_start')
+        if not name:
+            st.info("Enter the name of a CSV with a header row (merged_data or raw PRSA columns). "
+                    "Set AQI_STREAM_DIR to follow files in another directory.")
+            return
+        try:
+            path = streaming.stream_path(name)
+        except ValueError as e:
+            st.error(str(e))
+            return
+        config = (kind, path, from_start)
+
+    # Changing the source restarts the stream (and the online model)
+    stream = st.session_state.get('stream')
+    if stream is None or st.session_state.get('stream_config') != config:
+        if kind == "Replay history":
+            source = streaming.ReplaySource(speed=speed)
+        else:
+            source = streaming.FileTailSource(path, from_start=from_start)
+        stream = streaming.Stream(source)
+        st.session_state['stream'] = stream
+        st.session_state['stream_config'] = config
+        st.session_state['stream_alerts_seen'] = 0
+        st.session_state['stream_error'] = None
+
+    if hasattr(st, 'fragment'):
+        # Only this part of the page reruns on each refresh
+        st.fragment(_stream_view, run_every=STREAM_REFRESH_S)(stream)
+    else:
+        st.button("Fetch new readings")
+        _stream_view(stream)
@@ -1,6 +1,5 @@
 import streamlit as st
-import pandas as pd
-import os
+from my_utils import data, instrument
 
 #Page 2: Theoretical Analysis & Processing Steps
 def show():
@@ -55,7 +54,7 @@ def show():
             **What was done:**
             - **Resampled** the data at multiple time scales:
               - **Yearly**, **Monthly**, **Weekly**, **Daily** averages for each feature.
-              - **Hourly pattern** by grouping on hour-of-day.
+              - **Hourly patterns** by grouping on hour-of-day × station and weekday × hour.
               - **Seasonal** averages (Winter/Spring/Summer/Autumn).
             - Saved these summary tables (`yearly_summary.csv`, etc.) for quick lookups and visualizations.
             """
@@ -73,10 +72,9 @@ def show():
 
     # Preview of the cleaned dataset
     st.subheader("🗂️ Cleaned & Transformed Data Preview")
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    csv_path = os.path.join(BASE_DIR, '..', 'Data_set', 'merged_data_eda.csv')
-    df_eda = pd.read_csv(csv_path,parse_dates=['DATETIME'],index_col='DATETIME')
-    st.dataframe(df_eda.head(15), height=300)
+    with instrument.span('processing.preview'):
+        df_eda = data.load_eda()
+        st.dataframe(df_eda.head(15), height=300)
 
     # Concluding note
     st.markdown(
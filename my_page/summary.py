@@ -1,6 +1,5 @@
 import streamlit as st
-import pandas as pd
-import os
+from my_utils import instrument, metadata
 
 # Page 1: Project & Data Summary
 def show():
@@ -43,15 +42,16 @@ def show():
         """
     )
     st.subheader("🗃️ Raw Dataset Preview")
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    csv_path = os.path.join(BASE_DIR, '..', 'Data_set', 'merged_data.csv')
-    df_raw = pd.read_csv(csv_path)
-    col1, col2, col3 = st.columns(3)
-    col1.metric("📅 Timeframe Start", df_raw['YEAR'].min())
-    col2.metric("📅 Timeframe End",   df_raw['YEAR'].max())
-    col3.metric("📝 Total Records",   f"{len(df_raw):,}")
+    # Row count, year range and preview come from the metadata sidecar,
+    # so the landing page never parses the full raw dataset
+    with instrument.span('summary.raw_preview'):
+        meta = metadata.load_metadata('merged_data')
+        col1, col2, col3 = st.columns(3)
+        col1.metric("📅 Timeframe Start", meta['year_min'])
+        col2.metric("📅 Timeframe End",   meta['year_max'])
+        col3.metric("📝 Total Records",   f"{meta['rows']:,}")
 
-    st.dataframe(df_raw.head(15), height=300)
+        st.dataframe(metadata.preview('merged_data'), height=300)
 
     # Variables list
     st.markdown(
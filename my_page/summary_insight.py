@@ -1,9 +1,5 @@
 import streamlit as st
-import pandas as pd
-import os
-import io
-import zipfile
-import glob
+from my_utils import archive, data, instrument
 
 def show():
     st.title("📝 Summary & Insights")
@@ -48,24 +44,23 @@ def show():
 
     # --- Modeling & Performance ---
     st.header("4️⃣ Modeling & Performance Summary")
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    csv_path = os.path.join(BASE_DIR, '..', 'Data_set', 'model_performance_tuned.csv')
-    perf = pd.read_csv(csv_path, index_col=0)
-    best_model = perf['R2'].idxmax()
-    best_r2    = perf['R2'].max()
-    st.markdown(
-        f"""
-        We trained six regression models on the top-10 features (selected by **SelectKBest** after scaling):
-        - **Best performer:** {best_model} (R² = {best_r2:.3f})
-        - **Typical R² range:** {perf['R2'].min():.3f} – {perf['R2'].max():.3f}
-        - **RMSE range:** {perf['RMSE'].min():.2f} – {perf['RMSE'].max():.2f} AQI units
-        - **MAE range:**  {perf['MAE'].min():.2f} – {perf['MAE'].max():.2f} AQI units
-        """
-    )
-    st.dataframe(perf.style.format({
-        'R2':'{:.3f}', 'RMSE':'{:.2f}',
-        'MAE':'{:.2f}', 'MAPE_%':'{:.2f}%'
-    }), height=200)
+    with instrument.span('summary_insight.performance'):
+        perf = data.load_performance()
+        best_model = perf['R2'].idxmax()
+        best_r2    = perf['R2'].max()
+        st.markdown(
+            f"""
+            We trained six regression models on the top-10 features (selected by **SelectKBest** after scaling):
+            - **Best performer:** {best_model} (R² = {best_r2:.3f})
+            - **Typical R² range:** {perf['R2'].min():.3f} – {perf['R2'].max():.3f}
+            - **RMSE range:** {perf['RMSE'].min():.2f} – {perf['RMSE'].max():.2f} AQI units
+            - **MAE range:**  {perf['MAE'].min():.2f} – {perf['MAE'].max():.2f} AQI units
+            """
+        )
+        st.dataframe(perf.style.format({
+            'R2':'{:.3f}', 'RMSE':'{:.2f}',
+            'MAE':'{:.2f}', 'MAPE_%':'{:.2f}%'
+        }), height=200)
 
     # --- Prediction Tool Reminder ---
     st.header("5️⃣ Live Prediction Tool")
@@ -101,25 +96,12 @@ def show():
     st.header("📥 Download Project Files")
     st.markdown("Click below to download all CSV & PKL files used in this project as a single ZIP.")
 
-    # construct list of files
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    data_dir  = os.path.join(BASE_DIR, "..", "Data_set")
-    model_dir = os.path.join(BASE_DIR, "..", "Models")
-
-    files_to_zip = glob.glob(os.path.join(data_dir, "*.csv")) + \
-                   glob.glob(os.path.join(model_dir, "*.pkl"))
-
-    # create in-memory ZIP
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w") as zf:
-        for filepath in files_to_zip:
-            arcname = os.path.basename(filepath)
-            zf.write(filepath, arcname=arcname)
-    zip_buffer.seek(0)
-
-    st.download_button(
-        label="📦 Download All Files",
-        data=zip_buffer,
-        file_name="Beijing_AQI_Project_Files.zip",
-        mime="application/zip"
-    )
\ No newline at end of file
+    # The archive is built once on disk and its bytes are read once per process
+    # (my_utils/archive.py); a page view only hands those shared bytes to the button.
+    with instrument.span('summary_insight.download'):
+        st.download_button(
+            label="📦 Download All Files",
+            data=archive.archive_bytes(),
+            file_name=archive.DOWNLOAD_NAME,
+            mime="application/zip"
+        )
@@ -1,81 +1,49 @@
+import datetime
 import streamlit as st
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import os
+from my_utils import correlation, data, figcache, instrument, plotting, st_compat, stats, summaries
 
-# Page 3: Data Visualization
-def show():
-    st.title("📊 Interactive Data Visualization")
-    st.markdown(
-        """
-        Explore how air quality and pollution metrics evolve over time and relate to each other.
-        Use the controls below to select your feature and time resolution, then scroll down for
-        a suite of prebuilt summary charts and detailed explanations.
-        """
-    )
+SUMMARY_NAMES = [
+    'yearly_summary', 'monthly_summary', 'weekly_summary',
+    'daily_summary', 'seasonal_summary'
+]
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
 
-    # Load summaries
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    csv_path = os.path.join(BASE_DIR, '..', 'Data_set', 'yearly_summary.csv')
-    yearly   = pd.read_csv(csv_path,parse_dates=['DATETIME'], index_col='DATETIME')
-    csv_path = os.path.join(BASE_DIR, '..', 'Data_set', 'monthly_summary.csv')
-    monthly  = pd.read_csv(csv_path,parse_dates=['DATETIME'], index_col='DATETIME')
-    csv_path = os.path.join(BASE_DIR, '..', 'Data_set', 'weekly_summary.csv')
-    weekly   = pd.read_csv(csv_path,parse_dates=['DATETIME'], index_col='DATETIME')
-    csv_path = os.path.join(BASE_DIR, '..', 'Data_set', 'daily_summary.csv')
-    daily    = pd.read_csv(csv_path,parse_dates=['DATETIME'], index_col='DATETIME')
-    csv_path = os.path.join(BASE_DIR, '..', 'Data_set', 'seasonal_summary.csv')
-    seasonal = pd.read_csv(csv_path,index_col='SEASONS')
-
-    # Convert PeriodIndex to Timestamp for consistency
-    for df in (yearly, monthly, weekly, daily):
-        if hasattr(df.index, "to_timestamp"):
-            df.index = df.index.to_timestamp()
 
-    # --- Custom Plot controls ---
-    st.subheader("🔍 Custom Plot")
-    feats = [
-        'AQI','PM2.5','PM10','SO2','NO2','CO','O3',
-        'Vehicular_Pollution','Industrial_Pollution'
-    ]
-    period_map = {
-        'Yearly': yearly,
-        'Monthly': monthly,
-        'Weekly': weekly,
-        'Daily': daily,
-        'Seasonal': seasonal
-    }
-    feat   = st.selectbox("Select Feature:", feats)
-    period = st.selectbox("Select Time Resolution:", list(period_map.keys()))
+# Chart renderers: each returns a Figure and is only called on a cache miss,
+# so the EDA frame is not touched when every chart is already cached.
 
-    df_scope = period_map[period]
+def _custom_fig(feat, period):
+    df_scope = data.load_summary(period.lower())
     fig, ax = plt.subplots(figsize=(10,4))
     if period == 'Seasonal':
         df_scope[feat].plot.bar(ax=ax, color='teal')
-        summary = (
-            f"📈 The seasonal bar chart shows the average **{feat}** for each season, "
-            "highlighting when pollution peaks (e.g., winter heating vs. summer smog)."
-        )
     else:
         df_scope[feat].plot.line(ax=ax, color='navy', linewidth=2)
-        summary = (
-            f"📈 The {period.lower()} line chart for **{feat}** reveals trends and fluctuations "
-            "over time—useful for spotting long-term shifts or anomalies."
-        )
     ax.set_xlabel(period)
     ax.set_ylabel(feat)
-    st.pyplot(fig, use_container_width=True)
-    st.markdown(summary)
+    return fig
 
-    # --- Prebuilt summary charts ---
-    st.markdown("---")
-    st.markdown("### 📈 Air Quality Index (AQI) Overview")
 
-    # 1) Average AQI per Year
-    st.subheader("Average AQI per Year")
+def _hourly_fig(feat, stations, start, end):
+    # Reads only the chosen stations' partitions, time range and column
+    df = data.load_hourly([feat], stations=stations, start=start, end=end)
+    fig, ax = plt.subplots(figsize=(10,4))
+    for station, rows in df.groupby(df['STATION'].astype(str), sort=True):
+        ax.plot(rows.index, rows[feat], linewidth=1, label=station)
+    ax.set_xlabel('Hourly')
+    ax.set_ylabel(feat)
+    ax.legend(title='Station', bbox_to_anchor=(1.05,1))
+    fig.autofmt_xdate()
+    return fig
+
+
+def _yearly_aqi_fig():
     # Ensure datetime index is Timestamp
-    df_yearly = yearly.copy()
+    df_yearly = data.load_summary('yearly').copy()
     df_yearly.index = pd.to_datetime(df_yearly.index)
     # Create Year string column for categorical axis
     plot_df = (
@@ -86,15 +54,11 @@ def show():
     fig, ax = plt.subplots(figsize=(6,4))
     sns.pointplot(data=plot_df, x='YearStr', y='AQI', color='crimson', ax=ax)
     ax.set_xlabel("Year")
-    st.pyplot(fig, use_container_width=True)
-    st.markdown(
-        "👉 This point plot shows how the annual average AQI has changed, indicating "
-        "whether overall air quality is improving or deteriorating year by year."
-    )
+    return fig
 
-    # 2) Average Monthly AQI per Year
-    st.subheader("Average Monthly AQI per Year")
-    df_monthly = monthly.reset_index()
+
+def _monthly_aqi_fig():
+    df_monthly = data.load_summary('monthly').reset_index()
     df_monthly['Year'] = df_monthly['DATETIME'].dt.year
     fig, ax = plt.subplots(figsize=(10,4))
     sns.lineplot(
@@ -105,34 +69,28 @@ def show():
         ax=ax
     )
     ax.legend(title='Year', bbox_to_anchor=(1.05,1))
-    st.pyplot(fig, use_container_width=True)
-    st.markdown(
-        "👉 Overlaying each year's monthly AQI trend reveals seasonal cycles and year-to-year shifts."
-    )
+    return fig
 
-    # 3) Average AQI per Station per Year
-    st.subheader("Average AQI per Station per Year")
-    csv_path = os.path.join(BASE_DIR, '..', 'Data_set', 'merged_data_eda.csv')
-    df_eda = pd.read_csv(csv_path,parse_dates=['DATETIME'],index_col='DATETIME')
-    df_sta = df_eda.reset_index()
-    df_sta['Year'] = df_sta['DATETIME'].dt.year
+
+def _station_year_fig():
+    # Means and 95% CIs come precomputed from the station x year summary
+    table = summaries.load_station_summary('yearly')
+    stations = table.index.get_level_values('STATION').unique()
+    colors = sns.color_palette('tab20', len(stations))
     fig, ax = plt.subplots(figsize=(10,4))
-    sns.lineplot(
-        data=df_sta,
-        x='Year', y='AQI', hue='STATION',
-        palette='tab20', ax=ax
-    )
+    for station, color in zip(stations, colors):
+        rows = table.xs(station, level='STATION')
+        years = rows.index.year
+        ax.plot(years, rows['AQI'], color=color, label=station)
+        ax.fill_between(years, rows['AQI_ci_low'], rows['AQI_ci_high'], color=color, alpha=0.2)
+    ax.set_xlabel('Year')
+    ax.set_ylabel('AQI')
     ax.legend(title='Station', bbox_to_anchor=(1.05,1))
-    st.pyplot(fig, use_container_width=True)
-    st.markdown(
-        "👉 Comparing stations side-by-side highlights which areas consistently face worse pollution."
-    )
+    return fig
 
-    # --- Vehicle vs Industrial Emissions ---
-    st.markdown("---")
-    st.markdown("### 🚗 Vehicle & 🏭 Industrial Emissions Impact")
 
-    st.subheader("Yearly Average Pollution Trend")
+def _emissions_trend_fig():
+    yearly = data.load_summary('yearly')
     fig, ax = plt.subplots(figsize=(10,4))
     sns.lineplot(
         data=yearly[['Vehicular_Pollution','Industrial_Pollution']],
@@ -140,19 +98,19 @@ def show():
     )
     ax.set_ylabel("Pollution Level")
     ax.legend(title='Type')
-    st.pyplot(fig, use_container_width=True)
-    st.markdown(
-        "👉 This chart shows how traffic-related and industrial emissions have trended over years, indicating which source dominates."
-    )
+    return fig
 
-    st.subheader("Seasonal Pollution Pattern")
+
+def _emissions_seasonal_fig():
+    seasonal = data.load_summary('seasonal')
     fig, ax = plt.subplots(figsize=(8,4))
     sns.barplot(
         x=seasonal.index,
         y='Vehicular_Pollution',
         data=seasonal,
         color='orange',
-        label='Vehicular'
+        label='Vehicular',
+        ax=ax
     )
     sns.barplot(
         x=seasonal.index,
@@ -160,10 +118,203 @@ def show():
         data=seasonal,
         color='purple',
         alpha=0.6,
-        label='Industrial'
+        label='Industrial',
+        ax=ax
     )
     ax.legend()
-    st.pyplot(fig, use_container_width=True)
+    return fig
+
+
+def _rain_fig(raw):
+    # AQI quantiles per rainfall bin, precomputed in the stats artifact
+    bins = stats.rain_aqi_bins()
+    fig, ax = plt.subplots(figsize=(8,4))
+    if raw:
+        df_eda = data.load_eda()
+        rows = plotting.eda_sample()
+        ax.scatter(df_eda['RAIN'].to_numpy()[rows], df_eda['AQI'].to_numpy()[rows],
+                   color='blue', alpha=0.3, s=10, label='Sampled hours')
+    x = bins['rain_mean']
+    ax.fill_between(x, bins['q10'], bins['q90'], color='blue', alpha=0.1, label='10th-90th percentile')
+    ax.fill_between(x, bins['q25'], bins['q75'], color='blue', alpha=0.25, label='Interquartile range')
+    ax.plot(x, bins['median'], color='navy', marker='o', label='Median')
+    ax.plot(x, bins['mean'], color='crimson', linestyle='--', label='Mean')
+    ax.set_xscale('symlog', linthresh=1)
+    ax.set_xlabel('RAIN')
+    ax.set_ylabel('AQI')
+    ax.legend()
+    return fig
+
+
+def _temp_dewp_fig(raw):
+    # Five-number summaries per season, precomputed in the stats artifact
+    fig, axes = plt.subplots(1,2, figsize=(12,4))
+    for ax, col, palette in zip(axes, ['TEMP', 'DEWP'], ['cool', 'autumn']):
+        boxes = stats.season_boxes(col)
+        seasons = [name for name, box in boxes.items() if box]
+        colors = sns.color_palette(palette, len(seasons))
+        artists = ax.bxp(
+            [dict(boxes[name], label=name) for name in seasons],
+            showfliers=False, patch_artist=True
+        )
+        for patch, color in zip(artists['boxes'], colors):
+            patch.set_facecolor(color)
+        if raw:
+            df_eda = data.load_eda()
+            sample = df_eda.iloc[plotting.eda_sample()]
+            for pos, name in enumerate(seasons, start=1):
+                values = sample.loc[sample['SEASONS'] == name, col].to_numpy()
+                jitter = np.random.default_rng(pos).uniform(-0.2, 0.2, len(values))
+                ax.scatter(pos + jitter, values, color='black', alpha=0.3, s=6)
+        ax.set_xlabel('SEASONS')
+        ax.set_ylabel(col)
+    axes[0].set_title("Temperature by Season")
+    axes[1].set_title("Dew Point by Season")
+    return fig
+
+
+def _pattern_fig(table, feat):
+    # Only the chosen feature's column of the precomputed pattern table is used
+    values = summaries.load_pattern_summary(table, [feat])[feat]
+    if table == 'hour_station':
+        fig, ax = plt.subplots(figsize=(10,4))
+        grid = values.unstack('STATION')
+        grid.plot(ax=ax, colormap='tab20', linewidth=2)
+        ax.set_xticks(range(0, 24, 2))
+        ax.set_xlabel('Hour of day')
+        ax.set_ylabel(feat)
+        ax.legend(title='Station', bbox_to_anchor=(1.05,1))
+    else:
+        fig, ax = plt.subplots(figsize=(12,4))
+        grid = values.unstack('HOUR')
+        grid.index = [WEEKDAYS[d] for d in grid.index]
+        sns.heatmap(grid, cmap='magma_r', ax=ax, cbar_kws={'label': feat})
+        ax.set_xlabel('Hour of day')
+        ax.set_ylabel('')
+    return fig
+
+
+def _corr_fig(station, season, year):
+    # Served from running moments (my_utils/correlation.py), not the hourly rows
+    corr = correlation.correlation(station=station, season=season, year=year)
+    fig, ax = plt.subplots(figsize=(8,6))
+    sns.heatmap(corr, annot=True, fmt=".2f", cmap="coolwarm", ax=ax)
+    return fig
+
+
+def _chart(chart_id, version, render, params=None):
+    """Show a chart from the figure cache, rendering it only on a miss."""
+    with instrument.span(f'visualization.{chart_id}'):
+        image = figcache.cached_figure(chart_id, params or {}, version, render)
+        st_compat.image(image)
+
+
+# Page 3: Data Visualization
+def show():
+    st.title("📊 Interactive Data Visualization")
+    st.markdown(
+        """
+        Explore how air quality and pollution metrics evolve over time and relate to each other.
+        Use the controls below to select your feature and time resolution, then scroll down for
+        a suite of prebuilt summary charts and detailed explanations.
+        """
+    )
+
+    # Data versions the cached charts are keyed on
+    with instrument.span('visualization.data_versions'):
+        summary_version = figcache.data_version(*SUMMARY_NAMES)
+        eda_version = figcache.data_version('merged_data_eda')
+        station_version = figcache.data_version('station_yearly_summary', 'merged_data_eda')
+
+    # --- Custom Plot controls ---
+    st.subheader("🔍 Custom Plot")
+    feats = [
+        'AQI','PM2.5','PM10','SO2','NO2','CO','O3',
+        'Vehicular_Pollution','Industrial_Pollution'
+    ]
+    periods = ['Yearly', 'Monthly', 'Weekly', 'Daily', 'Seasonal', 'Hourly']
+    feat   = st.selectbox("Select Feature:", feats)
+    period = st.selectbox("Select Time Resolution:", periods)
+
+    if period == 'Hourly':
+        # Date range and stations narrow the query on the hourly store
+        days = data.load_summary('daily').index
+        first, last = days.min().date(), days.max().date()
+        c1, c2 = st.columns(2)
+        picked = c1.date_input(
+            "Date range:", value=(max(first, last - datetime.timedelta(days=6)), last),
+            min_value=first, max_value=last
+        )
+        all_stations = sorted(stats.load_feature_stats()['by_station'])
+        stations = c2.multiselect("Stations:", all_stations, default=all_stations[:1])
+        if len(picked) != 2 or not stations:
+            st.info("Pick a start and end date and at least one station.")
+            summary = None
+        else:
+            start = pd.Timestamp(picked[0])
+            end = pd.Timestamp(picked[1]) + pd.Timedelta(hours=23)
+            params = {'feat': feat, 'stations': sorted(stations),
+                      'start': str(start), 'end': str(end)}
+            _chart('hourly', repr(data.hourly_signature()),
+                   lambda: _hourly_fig(feat, sorted(stations), start, end), params)
+            summary = (
+                f"📈 Hourly **{feat}** for {', '.join(sorted(stations))} between "
+                f"{picked[0]} and {picked[1]}—zoom in on individual episodes and daily cycles."
+            )
+    else:
+        if period == 'Seasonal':
+            summary = (
+                f"📈 The seasonal bar chart shows the average **{feat}** for each season, "
+                "highlighting when pollution peaks (e.g., winter heating vs. summer smog)."
+            )
+        else:
+            summary = (
+                f"📈 The {period.lower()} line chart for **{feat}** reveals trends and fluctuations "
+                "over time—useful for spotting long-term shifts or anomalies."
+            )
+        _chart('custom', summary_version, lambda: _custom_fig(feat, period),
+               {'feat': feat, 'period': period})
+    if summary:
+        st.markdown(summary)
+
+    # --- Prebuilt summary charts ---
+    st.markdown("---")
+    st.markdown("### 📈 Air Quality Index (AQI) Overview")
+
+    # 1) Average AQI per Year
+    st.subheader("Average AQI per Year")
+    _chart('yearly_aqi', summary_version, _yearly_aqi_fig)
+    st.markdown(
+        "👉 This point plot shows how the annual average AQI has changed, indicating "
+        "whether overall air quality is improving or deteriorating year by year."
+    )
+
+    # 2) Average Monthly AQI per Year
+    st.subheader("Average Monthly AQI per Year")
+    _chart('monthly_aqi', summary_version, _monthly_aqi_fig)
+    st.markdown(
+        "👉 Overlaying each year's monthly AQI trend reveals seasonal cycles and year-to-year shifts."
+    )
+
+    # 3) Average AQI per Station per Year
+    st.subheader("Average AQI per Station per Year")
+    _chart('station_year_aqi', station_version, _station_year_fig)
+    st.markdown(
+        "👉 Comparing stations side-by-side highlights which areas consistently face worse pollution."
+    )
+
+    # --- Vehicle vs Industrial Emissions ---
+    st.markdown("---")
+    st.markdown("### 🚗 Vehicle & 🏭 Industrial Emissions Impact")
+
+    st.subheader("Yearly Average Pollution Trend")
+    _chart('emissions_trend', summary_version, _emissions_trend_fig)
+    st.markdown(
+        "👉 This chart shows how traffic-related and industrial emissions have trended over years, indicating which source dominates."
+    )
+
+    st.subheader("Seasonal Pollution Pattern")
+    _chart('emissions_seasonal', summary_version, _emissions_seasonal_fig)
     st.markdown(
         "👉 Side-by-side seasonal bars compare how vehicle and industrial emissions vary across Winter/Spring/Summer/Autumn."
     )
@@ -171,33 +322,56 @@ def show():
     # --- Impact of Rain & Weather ---
     st.markdown("---")
     st.markdown("### ☔ Impact of Rain & Weather")
+    raw = st.checkbox(
+        f"Show raw points (sample of {plotting.DEFAULT_POINT_BUDGET:,} hours)", value=False
+    )
     st.subheader("Rainfall vs AQI")
-    fig, ax = plt.subplots(figsize=(8,4))
-    sns.scatterplot(x='RAIN', y='AQI', data=df_eda, ax=ax, color='blue', alpha=0.5)
-    st.pyplot(fig, use_container_width=True)
+    _chart('rain_aqi', eda_version, lambda: _rain_fig(raw), {'raw': raw})
     st.markdown(
-        "👉 Scatter plot reveals whether increased rainfall tends to coincide with lower AQI (cleaner air)."
+        "👉 AQI spread per rainfall bin reveals whether increased rainfall tends to coincide with lower AQI (cleaner air)."
     )
 
     st.subheader("Seasonal Temperature & Dew Point")
-    fig, axes = plt.subplots(1,2, figsize=(12,4))
-    sns.boxplot(x='SEASONS', y='TEMP', data=df_eda, ax=axes[0], palette='cool')
-    axes[0].set_title("Temperature by Season")
-    sns.boxplot(x='SEASONS', y='DEWP', data=df_eda, ax=axes[1], palette='autumn')
-    axes[1].set_title("Dew Point by Season")
-    st.pyplot(fig, use_container_width=True)
+    _chart('temp_dewp', eda_version, lambda: _temp_dewp_fig(raw), {'raw': raw})
     st.markdown(
         "👉 Boxplots show the distribution of temperature and dew point across seasons, helping to contextualize pollutant dispersion conditions."
     )
 
+    # --- Hourly patterns (drill-down, loaded on demand) ---
+    st.markdown("---")
+    st.markdown("### 🕒 Hourly Patterns")
+    if st.checkbox("Show hourly drill-down", value=False):
+        views = {
+            'Hour of day by station': 'hour_station',
+            'Weekday × hour': 'weekday_hour',
+        }
+        c1, c2 = st.columns(2)
+        pattern_feat = c1.selectbox("Feature:", feats, key='pattern_feat')
+        view = c2.radio("View:", list(views.keys()), horizontal=True)
+        table = views[view]
+        pattern_version = figcache.data_version(f'{table}_summary', 'merged_data_eda')
+        _chart('pattern', pattern_version, lambda: _pattern_fig(table, pattern_feat),
+               {'table': table, 'feat': pattern_feat})
+        st.markdown(
+            "👉 Average by hour of day reveals rush-hour peaks and overnight build-up; "
+            "the weekday view shows whether weekends differ from working days."
+        )
+
     # --- Correlation Heatmap ---
     st.markdown("---")
     st.subheader("🔗 Correlation Heatmap")
-    num_df = df_eda.select_dtypes(include='number')
-    corr = num_df.corr()
-    fig2, ax2 = plt.subplots(figsize=(8,6))
-    sns.heatmap(corr, annot=True, fmt=".2f", cmap="coolwarm", ax=ax2)
-    st.pyplot(fig2, use_container_width=True)
+    with instrument.span('visualization.correlation_slices'):
+        options = correlation.slices()
+    c1, c2, c3 = st.columns(3)
+    station = c1.selectbox("Station:", ['All'] + options['STATION'])
+    season  = c2.selectbox("Season:", ['All'] + options['SEASONS'])
+    year    = c3.selectbox("Year:", ['All'] + options['YEAR'])
+    params = {
+        'station': None if station == 'All' else station,
+        'season': None if season == 'All' else season,
+        'year': None if year == 'All' else year,
+    }
+    _chart('correlation', eda_version, lambda: _corr_fig(**params), params)
     st.markdown(
         "📊 The heatmap highlights strong positive or negative relationships between features, guiding feature selection for modeling."
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,87 @@
+import glob
+import hashlib
+import os
+import threading
+import zipfile
+from my_utils import instrument
+
+# Project-files ZIP (every CSV in Data_set/ and every PKL in Models/), built
+# once on disk under a name derived from the inputs' names, sizes and mtimes.
+# The same archive is served until an input changes; older ones are removed.
+# Its bytes are read into memory once per archive and shared by every session.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BASE_DIR, '..')
+CACHE_DIR = os.path.join(ROOT_DIR, '.cache')
+
+INPUT_PATTERNS = [
+    os.path.join(ROOT_DIR, 'Data_set', '*.csv'),
+    os.path.join(ROOT_DIR, 'Models', '*.pkl'),
+]
+DOWNLOAD_NAME = 'Beijing_AQI_Project_Files.zip'
+
+_lock = threading.Lock()
+_bytes = {}     # archive path -> contents, for the current archive only
+
+
+def input_files():
+    return [f for pattern in INPUT_PATTERNS for f in sorted(glob.glob(pattern))]
+
+
+def archive_key(files=None):
+    """Hash of the (name, size, mtime_ns) of every input file."""
+    digest = hashlib.sha1()
+    for path in input_files() if files is None else files:
+        st = os.stat(path)
+        digest.update(f'{os.path.basename(path)}\0{st.st_size}\0{st.st_mtime_ns}\n'.encode())
+    return digest.hexdigest()[:16]
+
+
+def archive_path(key=None):
+    return os.path.join(CACHE_DIR, f'project-{key or archive_key()}.zip')
+
+
+def build_archive():
+    """Path of the ZIP for the current inputs, writing it first if needed."""
+    files = input_files()
+    path = archive_path(archive_key(files))
+    if os.path.exists(path):
+        instrument.cache_event('archive', True)
+        return path
+
+    # One builder per process; other sessions wait and reuse its archive
+    with _lock:
+        if os.path.exists(path):
+            instrument.cache_event('archive', True)
+            return path
+        instrument.cache_event('archive', False)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with instrument.span('archive.build'), \
+                zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for filepath in files:
+                zf.write(filepath, arcname=os.path.basename(filepath))
+        os.replace(tmp_path, path)
+        for old in glob.glob(os.path.join(CACHE_DIR, 'project-*.zip')):
+            if old != path:
+                os.remove(old)
+    return path
+
+
+def archive_bytes():
+    """Contents of the current archive, read from disk once per archive key."""
+    path = build_archive()
+    with _lock:
+        content = _bytes.get(path)
+        instrument.cache_event('archive_bytes', content is not None)
+        if content is None:
+            with open(path, 'rb') as f:
+                content = f.read()
+            _bytes.clear()
+            _bytes[path] = content
+    return content
+
+
+if __name__ == '__main__':
+    path = build_archive()
+    print(f"{path} ({os.path.getsize(path) / 1e6:.1f} MB)")
@@ -0,0 +1,92 @@
+import os
+import numpy as np
+
+# Typed columnar (Feather / Arrow IPC) copies of the Data_set CSVs.
+# Copies are written uncompressed next to their CSV so they can be memory-mapped:
+# numeric columns without nulls are then handed to pandas without a copy.
+
+SUFFIX = '.feather'
+
+# A float column is stored as float32 only if every value has at most this many
+# decimals and survives the float32 round trip unchanged at that precision.
+FLOAT32_DECIMALS = 3
+
+
+def columnar_path(csv_path):
+    return os.path.splitext(csv_path)[0] + SUFFIX
+
+
+def is_fresh(csv_path):
+    """True if a columnar copy exists and is at least as new as its CSV."""
+    path = columnar_path(csv_path)
+    if not os.path.exists(path):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    return os.stat(path).st_mtime_ns >= os.stat(csv_path).st_mtime_ns
+
+
+def _float32_safe(values):
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return True
+    rounded = np.round(values, FLOAT32_DECIMALS)
+    if not np.array_equal(rounded, values):
+        return False
+    back = np.round(values.astype(np.float32).astype(np.float64), FLOAT32_DECIMALS)
+    return np.array_equal(back, rounded)
+
+
+def downcast(df):
+    """Return ``df`` with every float64 column that is float32-safe downcast."""
+    safe = [
+        c for c in df.columns
+        if df[c].dtype == np.float64 and _float32_safe(df[c].to_numpy())
+    ]
+    if not safe:
+        return df
+    return df.astype({c: np.float32 for c in safe})
+
+
+def write_columnar(df, csv_path):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    path = columnar_path(csv_path)
+    table = pa.Table.from_pandas(downcast(df))
+    tmp_path = path + '.tmp'
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_table(csv_path, columns=None, memory_map=True):
+    """Arrow table view of the copy; with ``memory_map`` nothing is read up front."""
+    import pyarrow.feather as feather
+
+    return feather.read_table(
+        columnar_path(csv_path), columns=columns, memory_map=memory_map
+    )
+
+
+def read_columnar(csv_path, columns=None, memory_map=True):
+    table = read_table(csv_path, columns=columns, memory_map=memory_map)
+    # split_blocks keeps each column in its own block so pandas can wrap the
+    # mapped Arrow buffers instead of consolidating them into a new 2-D array.
+    return table.to_pandas(split_blocks=True)
+
+
+if __name__ == '__main__':
+    # python -m my_utils.columnar  ->  refresh every stale or missing copy
+    # plus the metadata sidecar of the raw table and the feature stats
+    # artifact derived from the EDA data
+    from my_utils import data, metadata, stats
+
+    for name, path in data.build_columnar().items():
+        print(f"{name:<20} -> {path}")
+    if os.path.exists(data.data_path('merged_data')):
+        metadata.build_metadata('merged_data')
+        print(f"{'raw metadata':<20} -> {metadata.sidecar_path('merged_data')}")
+    if os.path.exists(data.data_path('merged_data_eda')):
+        stats.load_feature_stats()
+        print(f"{'feature stats':<20} -> {stats.STATS_PATH}")
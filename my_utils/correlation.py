@@ -0,0 +1,210 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from my_utils import data
+
+# Correlation matrices of the EDA frame's numeric columns, served from running
+# moments instead of re-scanning the hourly rows. For every (station, season,
+# year) cell the state keeps, per column pair, the count, sums, sums of squares
+# and cross-products over rows where both columns are present. Any slice is the
+# sum of its cells, new hours are folded in by adding their moments, and the
+# result equals DataFrame.corr() (pairwise-complete Pearson).
+#
+# The state is stored in Data_set/corr_state.npz and rebuilt when the EDA
+# data changes without going through update_state().
+
+STATE_PATH = os.path.join(data.DATA_DIR, 'corr_state.npz')
+
+SLICE_KEYS = ['STATION', 'SEASONS', 'YEAR']
+
+_cache = {}
+_lock = threading.Lock()
+
+
+class PairMoments:
+    """Pairwise-complete first and second moments of a k-column stream."""
+
+    def __init__(self, k):
+        self.n = np.zeros((k, k))
+        self.s = np.zeros((k, k))     # s[i, j]: sum of column i where i and j are present
+        self.ss = np.zeros((k, k))    # same for squares
+        self.cp = np.zeros((k, k))    # sum of x_i * x_j
+
+    def update(self, values):
+        """Add rows of a (rows, k) float array; NaN marks a missing reading."""
+        mask = ~np.isnan(values)
+        x = np.where(mask, values, 0.0)
+        m = mask.astype('float64')
+        self.n += m.T @ m
+        self.s += x.T @ m
+        self.ss += (x * x).T @ m
+        self.cp += x.T @ x
+        return self
+
+    def merge(self, other):
+        self.n += other.n
+        self.s += other.s
+        self.ss += other.ss
+        self.cp += other.cp
+        return self
+
+    def corr(self):
+        n, s, ss = self.n, self.s, self.ss
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = n * self.cp - s * s.T
+            var_i = n * ss - s * s
+            var_j = var_i.T
+            r = cov / np.sqrt(var_i * var_j)
+        r[(n < 2) | ~(var_i > 0) | ~(var_j > 0)] = np.nan
+        return np.clip(r, -1.0, 1.0)
+
+
+def _cell_keys(df):
+    return [
+        df['STATION'].astype(str).to_numpy(),
+        df['SEASONS'].astype(str).to_numpy(),
+        pd.DatetimeIndex(df.index).year.to_numpy(),
+    ]
+
+
+def accumulate(df, columns, shift):
+    """{(station, season, year): PairMoments} for the rows of ``df``."""
+    # Moments are taken around a fixed shift (the column means at build time)
+    # so the raw sums stay small enough to subtract without cancellation.
+    values = df[columns].to_numpy(dtype='float64') - shift
+    cells = {}
+    groups = pd.DataFrame(dict(zip(SLICE_KEYS, _cell_keys(df)))).groupby(SLICE_KEYS, sort=True).indices
+    for key, rows in groups.items():
+        station, season, year = key
+        cells[(station, season, int(year))] = PairMoments(len(columns)).update(values[rows])
+    return cells
+
+
+def _source_signature():
+    return tuple(int(v) for v in data.signature('merged_data_eda'))
+
+
+def build_state(df=None):
+    """Accumulate the moments of the whole EDA frame and write them to STATE_PATH."""
+    if df is None:
+        df = data.load_eda()
+    columns = list(df.select_dtypes(include='number').columns)
+    shift = np.nan_to_num(np.nanmean(df[columns].to_numpy(dtype='float64'), axis=0))
+    state = {
+        'columns': columns,
+        'shift': shift,
+        'cells': accumulate(df, columns, shift),
+        'source': _source_signature(),
+    }
+    save_state(state)
+    return state
+
+
+def save_state(state):
+    keys = sorted(state['cells'])
+    cells = [state['cells'][key] for key in keys]
+    arrays = {
+        'columns': np.array(state['columns']),
+        'shift': state['shift'],
+        'source': np.array(state['source'], dtype='int64'),
+        'stations': np.array([k[0] for k in keys]),
+        'seasons': np.array([k[1] for k in keys]),
+        'years': np.array([k[2] for k in keys], dtype='int64'),
+    }
+    for name in ('n', 's', 'ss', 'cp'):
+        arrays[name] = np.stack([getattr(c, name) for c in cells])
+    tmp_path = STATE_PATH + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def _read_state():
+    if not os.path.exists(STATE_PATH):
+        return None
+    saved = np.load(STATE_PATH)
+    columns = [str(c) for c in saved['columns']]
+    cells = {}
+    for i, key in enumerate(zip(saved['stations'], saved['seasons'], saved['years'])):
+        moments = PairMoments(len(columns))
+        for name in ('n', 's', 'ss', 'cp'):
+            setattr(moments, name, saved[name][i].copy())
+        cells[(str(key[0]), str(key[1]), int(key[2]))] = moments
+    return {
+        'columns': columns,
+        'shift': saved['shift'],
+        'cells': cells,
+        'source': tuple(int(v) for v in saved['source']),
+    }
+
+
+def load_state():
+    """Return the moment state, rebuilding it if the EDA data has changed."""
+    sig = _source_signature()
+    hit = _cache.get('state')
+    if hit is not None and hit['source'] == sig:
+        return hit
+
+    with _lock:
+        hit = _cache.get('state')
+        if hit is not None and hit['source'] == sig:
+            return hit
+        state = _read_state()
+        if state is None or state['source'] != sig:
+            state = build_state()
+        _cache.clear()
+        _cache['state'] = state
+        return state
+
+
+def update_state(new_rows):
+    """Fold hours appended to the EDA data into the saved moments.
+
+    Call this after the rows have been written to the EDA source, so the
+    state is recorded against the updated file and not rebuilt on next load.
+    """
+    state = _read_state()
+    if state is None:
+        raise FileNotFoundError(f"No correlation state at {STATE_PATH}; run build_state() first")
+    for key, moments in accumulate(new_rows, state['columns'], state['shift']).items():
+        if key in state['cells']:
+            state['cells'][key].merge(moments)
+        else:
+            state['cells'][key] = moments
+    state['source'] = _source_signature()
+    save_state(state)
+    with _lock:
+        _cache.clear()
+        _cache['state'] = state
+    return state
+
+
+def slices():
+    """{'STATION': [...], 'SEASONS': [...], 'YEAR': [...]} values present in the state."""
+    keys = load_state()['cells'].keys()
+    return {name: sorted({k[i] for k in keys}) for i, name in enumerate(SLICE_KEYS)}
+
+
+def correlation(station=None, season=None, year=None):
+    """Correlation matrix (DataFrame) over all rows or over one station/season/year slice."""
+    state = load_state()
+    key = ('corr', station, season, year, state['source'])
+    hit = _cache.get(key)
+    if hit is not None:
+        return hit
+
+    wanted = (station, season, year)
+    total = PairMoments(len(state['columns']))
+    for cell_key, moments in state['cells'].items():
+        if all(w is None or w == k for w, k in zip(wanted, cell_key)):
+            total.merge(moments)
+    corr = pd.DataFrame(total.corr(), index=state['columns'], columns=state['columns'])
+    _cache[key] = corr
+    return corr
+
+
+if __name__ == '__main__':
+    state = build_state()
+    print(f"Wrote correlation moments for {len(state['columns'])} columns in "
+          f"{len(state['cells'])} station/season/year cells to {STATE_PATH}")
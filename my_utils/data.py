@@ -0,0 +1,213 @@
+import os
+import threading
+import pandas as pd
+from my_utils import columnar, instrument, store
+
+# Shared data-access layer: every page loads its tables through here instead of
+# calling pd.read_csv directly. Each table is parsed once per process and the
+# same object is handed to every session until the file's mtime changes, so
+# callers must treat the returned frames as read-only.
+# When a fresh columnar copy (see my_utils/columnar.py) sits next to a CSV it is
+# memory-mapped instead of parsing the text; stale or missing copies fall back
+# to the CSV. Without either, the EDA frame is read from the partitioned hourly
+# store that my_utils/ingest.py writes.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, '..', 'Data_set')
+
+CATEGORICAL_COLS = ['STATION', 'WD', 'SEASONS', 'AQI_Category']
+NUMERIC_COLS = [
+    'PM2.5', 'PM10', 'SO2', 'NO2', 'CO', 'O3',
+    'TEMP', 'PRES', 'DEWP', 'RAIN', 'WSPM',
+    'AQI', 'Vehicular_Pollution', 'Industrial_Pollution'
+]
+
+_NUMERIC_DTYPES = {c: 'float64' for c in NUMERIC_COLS}
+_CATEGORY_DTYPES = {c: 'category' for c in CATEGORICAL_COLS}
+
+# name -> (file name, read_csv keyword arguments)
+DATASETS = {
+    'merged_data': ('merged_data.csv', {
+        'dtype': {**_NUMERIC_DTYPES, **_CATEGORY_DTYPES},
+    }),
+    'merged_data_eda': ('merged_data_eda.csv', {
+        'parse_dates': ['DATETIME'], 'index_col': 'DATETIME',
+        'dtype': {**_NUMERIC_DTYPES, **_CATEGORY_DTYPES},
+    }),
+    'yearly_summary': ('yearly_summary.csv', {
+        'parse_dates': ['DATETIME'], 'index_col': 'DATETIME',
+    }),
+    'monthly_summary': ('monthly_summary.csv', {
+        'parse_dates': ['DATETIME'], 'index_col': 'DATETIME',
+    }),
+    'weekly_summary': ('weekly_summary.csv', {
+        'parse_dates': ['DATETIME'], 'index_col': 'DATETIME',
+    }),
+    'daily_summary': ('daily_summary.csv', {
+        'parse_dates': ['DATETIME'], 'index_col': 'DATETIME',
+    }),
+    'seasonal_summary': ('seasonal_summary.csv', {
+        'index_col': 'SEASONS',
+    }),
+    'station_yearly_summary': ('station_yearly_summary.csv', {
+        'parse_dates': ['DATETIME'], 'index_col': ['STATION', 'DATETIME'],
+    }),
+    'station_monthly_summary': ('station_monthly_summary.csv', {
+        'parse_dates': ['DATETIME'], 'index_col': ['STATION', 'DATETIME'],
+    }),
+    'hour_station_summary': ('hour_station_summary.csv', {
+        'index_col': ['HOUR', 'STATION'],
+    }),
+    'weekday_hour_summary': ('weekday_hour_summary.csv', {
+        'index_col': ['WEEKDAY', 'HOUR'],
+    }),
+    'model_performance': ('model_performance_tuned.csv', {
+        'index_col': 0,
+    }),
+    'model_predictions': ('model_predictions_tuned.csv', {}),
+}
+
+# Datasets that can be served from the hourly store when no file exists
+STORE_BACKED = {'merged_data_eda'}
+
+_cache = {}
+_locks = {name: threading.Lock() for name in DATASETS}
+
+
+def data_path(name):
+    return os.path.join(DATA_DIR, DATASETS[name][0])
+
+
+def _signature(path):
+    # The CSV is the source of truth; a deployment may ship only the copy.
+    if not os.path.exists(path):
+        path = columnar.columnar_path(path)
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _from_store(name):
+    path = data_path(name)
+    return (
+        name in STORE_BACKED
+        and not os.path.exists(path)
+        and not os.path.exists(columnar.columnar_path(path))
+        and store.exists()
+    )
+
+
+def signature(name):
+    """(mtime_ns, size) of the dataset's source file; changes whenever it is rewritten."""
+    if _from_store(name):
+        return store.signature()
+    return _signature(data_path(name))
+
+
+def _read_csv(name):
+    file_name, kwargs = DATASETS[name]
+    return pd.read_csv(os.path.join(DATA_DIR, file_name), **kwargs)
+
+
+def _read(name):
+    if _from_store(name):
+        return store.load()
+    path = data_path(name)
+    if columnar.is_fresh(path):
+        try:
+            return columnar.read_columnar(path)
+        except (ImportError, OSError, ValueError):
+            pass
+    return _read_csv(name)
+
+
+def build_columnar(names=None, force=False):
+    """Write typed columnar copies next to the CSVs; returns {name: copy path}."""
+    written = {}
+    for name in names or DATASETS:
+        path = data_path(name)
+        if not os.path.exists(path):
+            continue
+        if force or not columnar.is_fresh(path):
+            written[name] = columnar.write_columnar(_read_csv(name), path)
+    return written
+
+
+def load(name):
+    """Return the cached DataFrame for ``name``, re-reading it if the file changed."""
+    sig = signature(name)
+    hit = _cache.get(name)
+    if hit is not None and hit[0] == sig:
+        instrument.cache_event('data', True)
+        return hit[1]
+
+    # One reader per dataset; other sessions asking for the same table wait
+    # here and pick up the freshly parsed frame instead of parsing it again.
+    with _locks[name]:
+        hit = _cache.get(name)
+        if hit is not None and hit[0] == sig:
+            instrument.cache_event('data', True)
+            return hit[1]
+        instrument.cache_event('data', False)
+        with instrument.span(f'data.read.{name}'):
+            df = _read(name)
+        _cache[name] = (sig, df)
+        return df
+
+
+def clear_cache(name=None):
+    if name is None:
+        _cache.clear()
+    else:
+        _cache.pop(name, None)
+
+
+def load_raw():
+    return load('merged_data')
+
+
+def load_eda():
+    return load('merged_data_eda')
+
+
+def load_summary(period):
+    """``period`` is one of yearly, monthly, weekly, daily or seasonal."""
+    return load(f'{period}_summary')
+
+
+def load_hourly(columns=None, stations=None, start=None, end=None):
+    """Hourly EDA rows for some stations and a [start, end] time range.
+
+    With the hourly store present only the matching partitions and columns are
+    read; otherwise the cached EDA frame is sliced.
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(['STATION', *columns]))
+    if store.exists():
+        return store.load(stations=stations, columns=columns, start=start, end=end)
+    df = load_eda()
+    mask = pd.Series(True, index=df.index)
+    if stations is not None:
+        mask &= df['STATION'].isin(stations)
+    if start is not None:
+        mask &= df.index >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df.index <= pd.Timestamp(end)
+    return df.loc[mask.to_numpy(), columns if columns is not None else df.columns]
+
+
+def hourly_signature():
+    """Signature of whatever load_hourly() reads from."""
+    return store.signature() if store.exists() else signature('merged_data_eda')
+
+
+def load_station_summary(period):
+    """Station x period table; ``period`` is yearly or monthly."""
+    return load(f'station_{period}_summary')
+
+
+def load_performance():
+    return load('model_performance')
+
+
+def load_predictions():
+    return load('model_predictions')
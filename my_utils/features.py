@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+# Feature engineering as described on the processing page, vectorized with
+# NumPy: EPA AQI sub-indices and overall AQI, AQI category, vehicular and
+# industrial pollution aggregates, seasons, and the fixed category code maps
+# the scaler was trained on. Every step is row-local, so frames of any size
+# can be processed chunk by chunk (see engineer_csv).
+
+POLLUTANTS = ['PM2.5', 'PM10', 'SO2', 'NO2', 'CO', 'O3']
+
+# Dataset concentrations are all µg/m³; EPA breakpoints for the gases are in
+# ppb (ppm for CO). Conversion at 25 °C and 1 atm: ppb = µg/m³ * 24.45 / MW.
+UNIT_FACTORS = {
+    'PM2.5': 1.0,
+    'PM10': 1.0,
+    'SO2': 24.45 / 64.07,
+    'NO2': 24.45 / 46.01,
+    'CO': 24.45 / 28.01 / 1000.0,   # -> ppm
+    'O3': 24.45 / 48.00,
+}
+
+# EPA truncation before the breakpoint lookup (number of decimals kept)
+TRUNCATE_DECIMALS = {'PM2.5': 1, 'PM10': 0, 'SO2': 0, 'NO2': 0, 'CO': 1, 'O3': 0}
+
+# (C_low, C_high, I_low, I_high) per pollutant, EPA AQI technical guidance.
+# O3 uses the 8-hour breakpoints, extended with the 1-hour ones above 404 ppb;
+# concentrations between two rows (only 201-404 ppb for O3 after truncation)
+# take the top index of the row below.
+BREAKPOINTS = {
+    'PM2.5': [(0.0, 12.0, 0, 50), (12.1, 35.4, 51, 100), (35.5, 55.4, 101, 150),
+              (55.5, 150.4, 151, 200), (150.5, 250.4, 201, 300),
+              (250.5, 350.4, 301, 400), (350.5, 500.4, 401, 500)],
+    'PM10': [(0, 54, 0, 50), (55, 154, 51, 100), (155, 254, 101, 150),
+             (255, 354, 151, 200), (355, 424, 201, 300),
+             (425, 504, 301, 400), (505, 604, 401, 500)],
+    'SO2': [(0, 35, 0, 50), (36, 75, 51, 100), (76, 185, 101, 150),
+            (186, 304, 151, 200), (305, 604, 201, 300),
+            (605, 804, 301, 400), (805, 1004, 401, 500)],
+    'NO2': [(0, 53, 0, 50), (54, 100, 51, 100), (101, 360, 101, 150),
+            (361, 649, 151, 200), (650, 1249, 201, 300),
+            (1250, 1649, 301, 400), (1650, 2049, 401, 500)],
+    'CO': [(0.0, 4.4, 0, 50), (4.5, 9.4, 51, 100), (9.5, 12.4, 101, 150),
+           (12.5, 15.4, 151, 200), (15.5, 30.4, 201, 300),
+           (30.5, 40.4, 301, 400), (40.5, 50.4, 401, 500)],
+    'O3': [(0, 54, 0, 50), (55, 70, 51, 100), (71, 85, 101, 150),
+           (86, 105, 151, 200), (106, 200, 201, 300),
+           (405, 504, 301, 400), (505, 604, 401, 500)],
+}
+_TABLES = {p: np.array(bp, dtype='float64').T for p, bp in BREAKPOINTS.items()}
+
+CATEGORY_BINS = [0, 50, 100, 150, 200, 300, 500]
+CATEGORY_LABELS = [
+    'Good',
+    'Moderate',
+    'Unhealthy for Sensitive Groups',
+    'Unhealthy',
+    'Very Unhealthy',
+    'Hazardous'
+]
+
+VEHICULAR_COLS = ['PM2.5', 'PM10', 'NO2', 'CO']
+INDUSTRIAL_COLS = ['SO2', 'O3']
+
+SEASON_BY_MONTH = {
+    12: 'Winter', 1: 'Winter', 2: 'Winter',
+    3: 'Spring', 4: 'Spring', 5: 'Spring',
+    6: 'Summer', 7: 'Summer', 8: 'Summer',
+    9: 'Autumn', 10: 'Autumn', 11: 'Autumn',
+}
+
+# Code maps used at training time: the training notebook encoded each column
+# with astype('category').cat.codes, i.e. categories in sorted order.
+CODE_MAPS = {
+    'WD': {v: i for i, v in enumerate(sorted([
+        'N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE',
+        'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW']))},
+    'STATION': {v: i for i, v in enumerate(sorted([
+        'Gucheng', 'Dongsi', 'Guanyuan', 'Shunyi', 'Huairou']))},
+    'SEASONS': {v: i for i, v in enumerate(sorted(['Winter', 'Spring', 'Summer', 'Autumn']))},
+    'AQI_Category': {v: i for i, v in enumerate(sorted(CATEGORY_LABELS))},
+}
+
+
+def sub_index(pollutant, conc):
+    """EPA sub-index for one pollutant; NaN for missing or negative concentrations."""
+    c = np.asarray(conc, dtype='float64') * UNIT_FACTORS[pollutant]
+    scale = 10.0 ** TRUNCATE_DECIMALS[pollutant]
+    c = np.floor(c * scale + 1e-9) / scale
+    c_lo, c_hi, i_lo, i_hi = _TABLES[pollutant]
+
+    # Concentrations above the table are reported as the top of the scale
+    over = c > c_hi[-1]
+    idx = np.minimum(np.searchsorted(c_hi, c, side='left'), len(c_hi) - 1)
+    aqi = (i_hi[idx] - i_lo[idx]) / (c_hi[idx] - c_lo[idx]) * (c - c_lo[idx]) + i_lo[idx]
+    aqi = np.where(c < c_lo[idx], i_hi[np.maximum(idx - 1, 0)], aqi)
+    aqi[over] = i_hi[-1]
+    aqi[~(c >= 0)] = np.nan
+    return aqi
+
+
+def compute_aqi(df, rounded=True):
+    """Overall AQI: the maximum sub-index over the pollutants present in ``df``."""
+    subs = np.column_stack([
+        sub_index(p, df[p].to_numpy()) for p in POLLUTANTS if p in df.columns
+    ])
+    aqi = np.full(len(subs), np.nan)
+    valid = ~np.isnan(subs).all(axis=1)
+    aqi[valid] = np.nanmax(subs[valid], axis=1)
+    return np.round(aqi) if rounded else aqi
+
+
+def categorize(aqi):
+    """Map AQI values to categories with the same bins as pd.cut(right=True, include_lowest=True)."""
+    aqi = np.asarray(aqi, dtype='float64')
+    codes = np.searchsorted(CATEGORY_BINS, aqi, side='left') - 1
+    codes[aqi == CATEGORY_BINS[0]] = 0
+    codes[~((aqi >= CATEGORY_BINS[0]) & (aqi <= CATEGORY_BINS[-1]))] = -1
+    return pd.Categorical.from_codes(codes, categories=CATEGORY_LABELS, ordered=True)
+
+
+def _row_mean(df, cols):
+    values = df[cols].to_numpy(dtype='float64')
+    counts = (~np.isnan(values)).sum(axis=1)
+    totals = np.nansum(values, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+
+def seasons(index):
+    """Season name for each timestamp."""
+    months = pd.DatetimeIndex(index).month
+    names = np.array([SEASON_BY_MONTH[m] for m in range(1, 13)], dtype=object)
+    return names[months - 1]
+
+
+def encode(df):
+    """Training-time category codes ({'WD_code': ..., ...}); unseen values become -1."""
+    codes = {}
+    for col, mapping in CODE_MAPS.items():
+        if col in df.columns:
+            # mapping is in code order, so the categorical codes are the training codes
+            cat = pd.Categorical(df[col], categories=list(mapping))
+            codes[f'{col}_code'] = pd.Series(cat.codes, index=df.index, dtype='int8')
+    return codes
+
+
+def engineer(df, with_codes=False):
+    """Return a copy of ``df`` with AQI, AQI_Category, pollution aggregates and SEASONS added.
+
+    ``df`` needs the pollutant columns and a DatetimeIndex (used for SEASONS
+    when that column is missing).
+    """
+    out = df.copy()
+    out['Vehicular_Pollution'] = _row_mean(out, VEHICULAR_COLS)
+    out['Industrial_Pollution'] = _row_mean(out, INDUSTRIAL_COLS)
+    out['AQI'] = compute_aqi(out)
+    out['AQI_Category'] = categorize(out['AQI'].to_numpy())
+    if 'SEASONS' not in out.columns:
+        out['SEASONS'] = seasons(out.index)
+    if with_codes:
+        for name, codes in encode(out).items():
+            out[name] = codes
+    return out
+
+
+def engineer_csv(src_path, dst_path, chunksize=250_000, index_col='DATETIME'):
+    """Stream ``src_path`` through engineer() chunk by chunk into ``dst_path``."""
+    reader = pd.read_csv(
+        src_path, parse_dates=[index_col], index_col=index_col, chunksize=chunksize
+    )
+    rows = 0
+    for i, chunk in enumerate(reader):
+        engineer(chunk).to_csv(dst_path, mode='w' if i == 0 else 'a', header=(i == 0))
+        rows += len(chunk)
+    return rows
@@ -0,0 +1,93 @@
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+import matplotlib.pyplot as plt
+from my_utils import data, instrument
+
+# Process-wide cache of rendered chart images. Entries are keyed by chart id,
+# chart parameters and a hash of the data files the chart reads, and evicted
+# least-recently-used once the stored bytes exceed the budget.
+
+MAX_BYTES = 64 * 1024 * 1024
+
+
+class FigureCache:
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            image = self._entries.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key, image):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._entries[key] = image
+            self.bytes += len(image)
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+
+_default = FigureCache()
+
+
+def _signature(name):
+    try:
+        return data.signature(name)
+    except FileNotFoundError:
+        return None
+
+
+def data_version(*names):
+    """Short hash of the signatures of the given datasets (see data.signature);
+    datasets that are not built yet count as None."""
+    sigs = [(name, _signature(name)) for name in names]
+    return hashlib.sha1(repr(sigs).encode()).hexdigest()[:16]
+
+
+def to_bytes(fig, fmt='png', dpi=100):
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def cached_figure(chart_id, params, version, render, fmt='png', cache=None):
+    """Rendered bytes of ``render()`` (a function returning a Figure), cached by
+    (chart_id, params, version, fmt)."""
+    cache = cache or _default
+    key = (chart_id, json.dumps(params, sort_keys=True, default=str), version, fmt)
+    image = cache.get(key)
+    instrument.cache_event('figure', image is not None)
+    if image is None:
+        with instrument.span(f'figure.render.{chart_id}'):
+            image = to_bytes(render(), fmt)
+        cache.put(key, image)
+    return image
+
+
+def cache_info(cache=None):
+    cache = cache or _default
+    return {'entries': len(cache._entries), 'bytes': cache.bytes,
+            'hits': cache.hits, 'misses': cache.misses}
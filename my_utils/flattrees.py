@@ -0,0 +1,227 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+import numpy as np
+from my_utils import instrument, models
+
+# Array-backed inference for the tree models. export() flattens the fitted
+# scaler -> selector -> tree (ensemble) pipeline into a few contiguous NumPy
+# arrays under Models/flat/<name>-<key>/, where the key hashes the source
+# pickles. load() memory-maps them, so opening a model costs no unpickling and
+# worker processes share the pages. Prediction applies the scaler to the columns
+# the trees use and walks every tree for every row at once, one level per step.
+#
+# Thresholds are stored as float32. scikit-learn casts the tree input to
+# float32 and tests x <= threshold against the float64 threshold, so the
+# threshold is rounded down to the largest float32 not above it; for any
+# float32 x both tests then agree and the predictions match.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FLAT_DIR = os.path.join(BASE_DIR, '..', 'Models', 'flat')
+
+TREE_MODELS = ('DecisionTree', 'RandomForest', 'GradientBoosting')
+ARRAYS = ['columns', 'mean', 'scale', 'feature', 'threshold', 'children', 'value', 'roots']
+
+# Rows walked at once; bounds the (rows x trees) node index matrix
+CHUNK_ROWS = 2048
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _source_paths(name):
+    paths = models.artifact_paths()
+    return [paths['scaler'], paths['selector'], paths[f'{name}_best']]
+
+
+def flat_key(name):
+    """Hash of the (name, size, mtime_ns) of the pickles ``name`` is exported from."""
+    digest = hashlib.sha1()
+    for path in _source_paths(name):
+        st = os.stat(path)
+        digest.update(f'{os.path.basename(path)}\0{st.st_size}\0{st.st_mtime_ns}\n'.encode())
+    return digest.hexdigest()[:16]
+
+
+def flat_path(name, key=None):
+    return os.path.join(FLAT_DIR, f'{name}-{key or flat_key(name)}')
+
+
+def float32_thresholds(threshold):
+    """Largest float32 not above each float64 threshold."""
+    t32 = threshold.astype(np.float32)
+    above = t32.astype(np.float64) > threshold
+    t32[above] = np.nextafter(t32[above], np.float32(-np.inf))
+    return t32
+
+
+def _trees(model):
+    """(trees, base, weight, scale): prediction = (base + sum(weight * leaf value)) * scale."""
+    kind = type(model).__name__
+    if kind == 'DecisionTreeRegressor':
+        return [model.tree_], 0.0, 1.0, 1.0
+    if kind in ('RandomForestRegressor', 'ExtraTreesRegressor'):
+        return [e.tree_ for e in model.estimators_], 0.0, 1.0, 1.0 / len(model.estimators_)
+    if kind == 'GradientBoostingRegressor':
+        init = model.init_
+        if type(init).__name__ != 'DummyRegressor':
+            raise ValueError(f"Unsupported GradientBoosting init estimator: {init!r}")
+        base = float(np.ravel(init.constant_)[0])
+        return [e.tree_ for e in model.estimators_[:, 0]], base, model.learning_rate, 1.0
+    raise ValueError(f"{kind} is not a supported tree model")
+
+
+def flatten(scaler, selector, model):
+    """(arrays, meta) for the fused scaler -> selector -> ``model`` pipeline."""
+    trees, base, weight, scale = _trees(model)
+
+    # Tree feature j reads selected column j, i.e. scaler column selected[j];
+    # keep only the scaler columns some tree actually splits on
+    selected = np.flatnonzero(selector.get_support())
+    used = sorted({int(f) for t in trees for f in t.feature[t.children_left != -1]})
+    columns = selected[used]
+    position = np.full(len(selected), -1, dtype=np.int32)
+    position[used] = np.arange(len(used), dtype=np.int32)
+
+    feature, threshold, children, value, roots = [], [], [], [], []
+    offset = 0
+    for t in trees:
+        leaf = t.children_left == -1
+        own = np.arange(offset, offset + t.node_count, dtype=np.int32)
+        # Leaves point back at themselves, so every row can take max_depth steps
+        feature.append(np.where(leaf, 0, position[np.maximum(t.feature, 0)]).astype(np.int32))
+        threshold.append(float32_thresholds(np.where(leaf, 0.0, t.threshold)))
+        children.append(np.stack([
+            np.where(leaf, own, t.children_left + offset),
+            np.where(leaf, own, t.children_right + offset),
+        ], axis=1).astype(np.int32))
+        value.append(t.value[:, 0, 0] * weight)
+        roots.append(offset)
+        offset += t.node_count
+
+    mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(scaler.n_features_in_)
+    std = scaler.scale_ if scaler.scale_ is not None else np.ones(scaler.n_features_in_)
+    arrays = {
+        'columns': columns.astype(np.int32),
+        'mean': np.asarray(mean, dtype=np.float64)[columns],
+        'scale': np.asarray(std, dtype=np.float64)[columns],
+        'feature': np.concatenate(feature),
+        'threshold': np.concatenate(threshold),
+        # Row i holds (left, right) of node i; flat index 2 * i + (x > threshold)
+        'children': np.concatenate(children),
+        'value': np.concatenate(value).astype(np.float64),
+        'roots': np.asarray(roots, dtype=np.int32),
+    }
+    meta = {
+        'model': type(model).__name__,
+        'features': [str(c) for c in scaler.feature_names_in_],
+        'trees': len(trees),
+        'nodes': int(offset),
+        'max_depth': int(max(t.max_depth for t in trees)),
+        'base': base,
+        'scale': scale,
+    }
+    return arrays, meta
+
+
+def export(name):
+    """Write the flat arrays for ``<name>_best`` (if not current) and return their directory."""
+    key = flat_key(name)
+    path = flat_path(name, key)
+    if os.path.exists(path):
+        return path
+
+    with _lock:
+        if os.path.exists(path):
+            return path
+        models.check_preprocessing(name)
+        with instrument.span(f'flat.export.{name}'):
+            arrays, meta = flatten(
+                models.load_artifact('scaler'), models.load_artifact('selector'),
+                models.load_artifact(f'{name}_best')
+            )
+            tmp_path = path + '.tmp'
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+            for array_name, arr in arrays.items():
+                np.save(os.path.join(tmp_path, f'{array_name}.npy'), np.ascontiguousarray(arr))
+            with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+                json.dump(meta, f, indent=1)
+            os.replace(tmp_path, path)
+        for old in glob.glob(os.path.join(FLAT_DIR, f'{name}-*')):
+            if old != path:
+                shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+class FlatTrees:
+    """Memory-mapped flat tree (ensemble); predict() takes rows in scaler feature order."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        for array_name in ARRAYS:
+            arr = np.load(os.path.join(path, f'{array_name}.npy'), mmap_mode='r')
+            # Plain ndarray views of the maps; indexing an np.memmap is slower
+            setattr(self, array_name, np.asarray(arr))
+        self.children = self.children.reshape(-1)
+        self.feature_names_in_ = np.asarray(self.meta['features'], dtype=object)
+
+    def transform(self, X):
+        """Scaled float32 values of the columns the trees split on."""
+        X = np.asarray(X, dtype=np.float64)
+        return ((X[:, self.columns] - self.mean) / self.scale).astype(np.float32)
+
+    def _walk(self, Z):
+        # Node index of every (row, tree), advanced one level per step with
+        # flat take()s, which are much cheaper than 2-D fancy indexing
+        flat_z = Z.ravel()
+        row_start = (np.arange(len(Z), dtype=np.int32) * Z.shape[1])[:, None]
+        node = np.broadcast_to(self.roots, (len(Z), len(self.roots)))
+        for _ in range(self.meta['max_depth']):
+            x = flat_z.take(row_start + self.feature.take(node))
+            go_right = x > self.threshold.take(node)
+            node = self.children.take((node << 1) | go_right)
+        return node
+
+    def predict(self, X):
+        Z = self.transform(X)
+        out = np.empty(len(Z), dtype=np.float64)
+        for start in range(0, len(Z), CHUNK_ROWS):
+            leaves = self.value.take(self._walk(Z[start:start + CHUNK_ROWS]))
+            # Trees are added one at a time, in the order scikit-learn adds them
+            total = np.full(len(leaves), self.meta['base'])
+            for i in range(leaves.shape[1]):
+                total += leaves[:, i]
+            out[start:start + CHUNK_ROWS] = total * self.meta['scale']
+        return out
+
+
+def load(name):
+    """Memory-mapped FlatTrees for ``name``, exported from its pickles first if needed."""
+    key = flat_key(name)
+    hit = _cache.get(name)
+    if hit is not None and hit[0] == key:
+        instrument.cache_event('flat', True)
+        return hit[1]
+    instrument.cache_event('flat', False)
+    predictor = FlatTrees(export(name))
+    _cache[name] = (key, predictor)
+    return predictor
+
+
+def available():
+    """Tree models with a tuned pickle, i.e. the ones load() can serve."""
+    return [n for n in models.available_models() if n in TREE_MODELS]
+
+
+if __name__ == '__main__':
+    for name in available():
+        path = export(name)
+        meta = FlatTrees(path).meta
+        print(f"{name}: {meta['trees']} trees, {meta['nodes']:,} nodes, "
+              f"depth {meta['max_depth']} -> {path}")
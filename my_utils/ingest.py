@@ -0,0 +1,284 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from my_utils import features, store
+
+# Streaming ingestion of raw per-station PRSA CSVs into the hourly store.
+#
+# Pass 1 streams every station file in chunks, interpolates missing readings
+# along time (carrying state across chunk boundaries), feeds a quantile
+# sketch per column and appends the interpolated rows to a staging store.
+# Pass 2 walks the staged station/year partitions one at a time, winsorizes at
+# the sketched 1st/99th percentiles, drops rows that are still incomplete,
+# adds the engineered features and appends the result to the hourly store.
+# Memory is bounded by the chunk size and the size of one partition.
+#
+# Stations are independent, so pass 1 runs one task per station file and
+# pass 2 one task per station/year partition on a process pool. Each file
+# stages into its own directory with its own sketch seed, and results are
+# merged in sorted order, so the output does not depend on the worker count.
+#
+# Each station hour is stored once: when a partition is finalized, hours staged
+# more than once (the same file passed twice, overlapping files) keep their
+# first copy, and hours already in the store are skipped. Ingesting a file
+# again therefore adds nothing.
+
+RAW_RENAME = {'No': 'NO', 'wd': 'WD', 'station': 'STATION'}
+MEASURE_COLS = [
+    'PM2.5', 'PM10', 'SO2', 'NO2', 'CO', 'O3',
+    'TEMP', 'PRES', 'DEWP', 'RAIN', 'WSPM'
+]
+# RAIN is left out: it is zero for most hours, so its 99th percentile would
+# clip away nearly every real rain event.
+WINSORIZE_COLS = ['PM2.5', 'PM10', 'SO2', 'NO2', 'CO', 'O3', 'TEMP', 'PRES', 'DEWP', 'WSPM']
+LOWER_Q, UPPER_Q = 0.01, 0.99
+
+STAGING = '_staging'
+SKETCH_FILE = '_sketch.npz'
+BOUNDS_FILE = '_winsor_bounds.json'
+
+
+class QuantileSketch:
+    """Fixed-size reservoir sample of a stream, for approximate quantiles.
+
+    Exact while fewer than ``capacity`` values have been seen; two sketches
+    can be merged into one that represents both streams.
+    """
+
+    def __init__(self, capacity=100_000, seed=0):
+        self.capacity = capacity
+        self.n = 0
+        self.sample = np.empty(0, dtype='float64')
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        room = self.capacity - len(self.sample)
+        if room > 0:
+            self.sample = np.concatenate([self.sample, values[:room]])
+            self.n += min(room, len(values))
+            values = values[room:]
+        if not len(values):
+            return
+        # Algorithm R, vectorized: item i (1-based over the whole stream)
+        # replaces a random slot with probability capacity / i.
+        seen = self.n + np.arange(1, len(values) + 1)
+        slots = (self._rng.random(len(values)) * seen).astype('int64')
+        keep = slots < self.capacity
+        self.sample[slots[keep]] = values[keep]
+        self.n += len(values)
+
+    def merge(self, other):
+        total = self.n + other.n
+        if total <= self.capacity:
+            self.sample = np.concatenate([self.sample, other.sample])
+        else:
+            take = self._rng.binomial(self.capacity, self.n / total)
+            take = min(take, len(self.sample))
+            rest = min(self.capacity - take, len(other.sample))
+            self.sample = np.concatenate([
+                self._rng.choice(self.sample, take, replace=False),
+                self._rng.choice(other.sample, rest, replace=False),
+            ])
+        self.n = total
+        return self
+
+    def quantile(self, q):
+        if not len(self.sample):
+            return np.nan
+        return float(np.quantile(self.sample, q))
+
+
+class StreamingInterpolator:
+    """Time-based linear interpolation over a stream of time-ordered chunks.
+
+    Rows whose gap is not yet closed (trailing NaNs in any column) are held
+    back until a later chunk supplies the next reading. At most ``max_carry``
+    rows are held; beyond that the oldest are released with their gaps left
+    open (they are dropped later like any other incomplete row).
+    """
+
+    def __init__(self, columns, max_carry=24 * 31):
+        self.columns = columns
+        self.max_carry = max_carry
+        self._carry = None      # last emitted row (anchor) + rows still pending
+        self._anchor = 0        # 1 if the first carry row was already emitted
+
+    def _interpolate(self, df):
+        out = df.copy()
+        out[self.columns] = df[self.columns].interpolate(method='time', limit_area='inside')
+        return out
+
+    def process(self, chunk):
+        frame = chunk if self._carry is None else pd.concat([self._carry, chunk])
+        frame = self._interpolate(frame)
+
+        # Position up to which every column has seen its latest reading
+        valid = frame[self.columns].notna().to_numpy()
+        last = np.where(valid.any(axis=0), len(frame) - 1 - np.argmax(valid[::-1], axis=0), -1)
+        cut = int(last.min())
+        if len(frame) - 1 - cut > self.max_carry:
+            cut = len(frame) - 1 - self.max_carry
+
+        emit = frame.iloc[self._anchor:cut + 1]
+        if cut >= 0:
+            self._carry, self._anchor = frame.iloc[cut:], 1
+        else:
+            self._carry, self._anchor = frame, 0
+        return emit
+
+    def flush(self):
+        rest = None if self._carry is None else self._carry.iloc[self._anchor:]
+        self._carry, self._anchor = None, 0
+        return rest
+
+
+def read_station_chunks(path, chunksize=100_000):
+    """Yield time-indexed chunks of a raw PRSA station CSV with EDA column names."""
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        chunk = chunk.rename(columns=RAW_RENAME)
+        chunk.index = pd.DatetimeIndex(
+            pd.to_datetime(chunk[['year', 'month', 'day', 'hour']]), name=store.INDEX_COL
+        )
+        yield chunk.drop(columns=['year', 'month', 'day', 'hour']).sort_index()
+
+
+def stage_station(path, staging_dir, chunksize=100_000, capacity=100_000, seed=0):
+    """Pass 1 for one station file; returns {column: QuantileSketch}."""
+    sketches = {c: QuantileSketch(capacity, seed) for c in WINSORIZE_COLS}
+    interp = StreamingInterpolator(MEASURE_COLS)
+
+    def emit(rows):
+        if rows is None or rows.empty:
+            return
+        for c in WINSORIZE_COLS:
+            sketches[c].update(rows[c].to_numpy())
+        store.append(rows, staging_dir)
+
+    for chunk in read_station_chunks(path, chunksize):
+        emit(interp.process(chunk))
+    emit(interp.flush())
+    return sketches
+
+
+def _staged_partitions(staging_root):
+    """{(station, year): [staging dirs holding it]} across every per-file staging dir."""
+    found = {}
+    for staging_dir in sorted(glob.glob(os.path.join(staging_root, '*'))):
+        for key in store.partitions(staging_dir):
+            found.setdefault(key, []).append(staging_dir)
+    return found
+
+
+def finalize_partition(station, year, bounds, staging_dirs, store_dir=None):
+    """Pass 2 for one staged partition: winsorize, drop incomplete rows, engineer features.
+
+    Rows for hours already staged or already in the store are dropped first.
+    """
+    df = pd.concat([
+        store.read_partition(station, year, store_dir=d) for d in staging_dirs
+    ]).sort_index(kind='stable')
+    df = df[~df.index.duplicated(keep='first')]
+    stored = store.read_partition(
+        station, year, columns=['STATION'], store_dir=store_dir,
+        start=df.index.min(), end=df.index.max()
+    )
+    df = df[~df.index.isin(stored.index)]
+    for c, (lo, hi) in bounds.items():
+        df[c] = df[c].clip(lo, hi)
+    df = df.dropna(subset=MEASURE_COLS + ['WD'])
+    if df.empty:
+        return []
+    return store.append(features.engineer(df), store_dir)
+
+
+def _load_sketches(store_dir):
+    path = os.path.join(store_dir, SKETCH_FILE)
+    if not os.path.exists(path):
+        return {}
+    saved = np.load(path)
+    sketches = {}
+    for c in WINSORIZE_COLS:
+        if f'sample:{c}' in saved:
+            sk = QuantileSketch(int(saved['capacity']))
+            sk.sample, sk.n = saved[f'sample:{c}'], int(saved[f'n:{c}'])
+            sketches[c] = sk
+    return sketches
+
+
+def _save_sketches(sketches, store_dir):
+    arrays = {'capacity': np.array(next(iter(sketches.values())).capacity)}
+    for c, sk in sketches.items():
+        arrays[f'sample:{c}'] = sk.sample
+        arrays[f'n:{c}'] = np.array(sk.n)
+    np.savez(os.path.join(store_dir, SKETCH_FILE), **arrays)
+
+
+def _run(fn, tasks, workers):
+    """Apply ``fn`` to each argument tuple, in a process pool unless workers == 1."""
+    if workers == 1:
+        return [fn(*args) for args in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fn, *args) for args in tasks]
+        return [f.result() for f in futures]
+
+
+def ingest(paths, store_dir=None, chunksize=100_000, capacity=100_000, workers=None):
+    """Stream raw station CSVs into the hourly store; returns the winsorization bounds used.
+
+    ``workers`` is the process count (default: one per CPU, 1 runs inline).
+    Percentiles are taken over everything ingested so far (the sketch is kept
+    in the store), so later batches are clipped consistently with earlier ones.
+    """
+    store_dir = store_dir or store.STORE_DIR
+    workers = workers or os.cpu_count() or 1
+    staging_root = os.path.join(store_dir, STAGING)
+    shutil.rmtree(staging_root, ignore_errors=True)
+    os.makedirs(store_dir, exist_ok=True)
+
+    # Pass 1: one task per station file, each staging into its own directory
+    paths = sorted(paths)
+    staged = _run(stage_station, [
+        (path, os.path.join(staging_root, f'{i:04d}'), chunksize, capacity, i)
+        for i, path in enumerate(paths)
+    ], workers)
+
+    sketches = _load_sketches(store_dir)
+    for file_sketches in staged:
+        for c, sk in file_sketches.items():
+            sketches[c] = sketches[c].merge(sk) if c in sketches else sk
+    bounds = {c: (sk.quantile(LOWER_Q), sk.quantile(UPPER_Q)) for c, sk in sketches.items()}
+
+    # Pass 2: one task per station/year partition
+    _run(finalize_partition, [
+        (station, year, bounds, dirs, store_dir)
+        for (station, year), dirs in sorted(_staged_partitions(staging_root).items())
+    ], workers)
+
+    _save_sketches(sketches, store_dir)
+    with open(os.path.join(store_dir, BOUNDS_FILE), 'w') as f:
+        json.dump(bounds, f, indent=1)
+    shutil.rmtree(staging_root, ignore_errors=True)
+    return bounds
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stream raw station CSVs into the hourly store")
+    parser.add_argument('paths', nargs='+', help="raw PRSA station CSV files or glob patterns")
+    parser.add_argument('--store', default=store.STORE_DIR)
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: one per CPU; 1 = no pool)")
+    args = parser.parse_args()
+
+    files = sorted({f for p in args.paths for f in glob.glob(p)})
+    bounds = ingest(files, args.store, args.chunksize, workers=args.workers)
+    print(f"Ingested {len(files)} file(s) into {args.store}")
+    for c, (lo, hi) in bounds.items():
+        print(f"  {c:<6} winsorized to [{lo:.2f}, {hi:.2f}]")
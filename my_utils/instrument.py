@@ -0,0 +1,215 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+# Lightweight instrumentation for the dashboard. Code wraps hot spots in
+# span('name'); caches report hits and misses with cache_event(). Each Streamlit
+# rerun runs in its own script thread, so a rerun started with start_run()
+# collects the spans and cache events of its thread only. Finished runs are kept
+# in a short history, and per-span / per-cache totals accumulate for the whole
+# process; both can be exported as JSON or Prometheus text.
+#
+# Wall time is always recorded (two perf_counter calls per span). Allocations
+# are recorded only while tracemalloc tracing is on. tracemalloc is global to
+# the interpreter, so tracing is a process setting: AQI_TRACEMALLOC=1 turns it
+# on at import, and set_tracing() switches it for every session at once.
+
+ENABLED = os.environ.get('AQI_INSTRUMENT', '1') != '0'
+TRACEMALLOC = os.environ.get('AQI_TRACEMALLOC') == '1'
+HISTORY = 50
+
+_local = threading.local()
+_lock = threading.Lock()
+_history = deque(maxlen=HISTORY)
+_span_totals = {}     # name -> [calls, seconds, allocated bytes]
+_cache_totals = {}    # (cache, 'hit' | 'miss') -> count
+
+
+class Run:
+    def __init__(self, label):
+        self.label = label
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.seconds = None
+        self.spans = []       # dicts in the order the spans finished
+        self.cache = {}       # (cache, result) -> count
+
+    def as_dict(self):
+        return {
+            'label': self.label,
+            'started': self.started,
+            'seconds': self.seconds,
+            'spans': self.spans,
+            'cache': [
+                {'cache': cache, 'result': result, 'count': n}
+                for (cache, result), n in sorted(self.cache.items())
+            ],
+        }
+
+
+def set_tracing(on):
+    """Turn allocation tracing (tracemalloc) on or off for the whole process."""
+    if on and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not on and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def tracing():
+    return tracemalloc.is_tracing()
+
+
+def start_run(label):
+    run = Run(label)
+    _local.run = run
+    _local.stack = []
+    return run
+
+
+def end_run():
+    """Finish the current thread's run and add it to the history."""
+    run = getattr(_local, 'run', None)
+    if run is None:
+        return None
+    run.seconds = time.perf_counter() - run.t0
+    _local.run = None
+    with _lock:
+        _history.append(run)
+    return run
+
+
+def current_run():
+    return getattr(_local, 'run', None)
+
+
+@contextmanager
+def span(name):
+    """Record wall time (and, when tracing, net and peak allocation) of the block."""
+    if not ENABLED:
+        yield
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    tracing = tracemalloc.is_tracing()
+    frame = {'child_peak': 0}
+    if tracing:
+        # Nested spans reset the peak counter, so hand the peak seen so far
+        # to the enclosing span before resetting it
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]['child_peak'] = max(stack[-1]['child_peak'], peak)
+        tracemalloc.reset_peak()
+        frame['mem0'] = current
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        run = current_run()
+        record = {'name': name, 'depth': len(stack), 'seconds': seconds,
+                  'start': start - run.t0 if run is not None else None}
+        allocated = 0
+        if tracing and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, frame['child_peak'])
+            if stack:
+                stack[-1]['child_peak'] = max(stack[-1]['child_peak'], peak)
+            allocated = current - frame['mem0']
+            record['alloc_bytes'] = allocated
+            record['peak_bytes'] = peak - frame['mem0']
+        if run is not None:
+            run.spans.append(record)
+        with _lock:
+            totals = _span_totals.setdefault(name, [0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += allocated
+
+
+def cache_event(cache, hit):
+    """Count a lookup in ``cache`` (e.g. 'data', 'figure', 'model') as a hit or a miss."""
+    if not ENABLED:
+        return
+    key = (cache, 'hit' if hit else 'miss')
+    run = current_run()
+    if run is not None:
+        run.cache[key] = run.cache.get(key, 0) + 1
+    with _lock:
+        _cache_totals[key] = _cache_totals.get(key, 0) + 1
+
+
+def history():
+    with _lock:
+        return list(_history)
+
+
+def reset():
+    with _lock:
+        _history.clear()
+        _span_totals.clear()
+        _cache_totals.clear()
+
+
+def to_json(last=HISTORY):
+    """Recent runs plus process totals, as a JSON string."""
+    with _lock:
+        runs = [run.as_dict() for run in list(_history)[-last:]]
+        spans = {
+            name: {'calls': calls, 'seconds': seconds, 'alloc_bytes': alloc}
+            for name, (calls, seconds, alloc) in sorted(_span_totals.items())
+        }
+        cache = [
+            {'cache': cache, 'result': result, 'count': n}
+            for (cache, result), n in sorted(_cache_totals.items())
+        ]
+    return json.dumps({
+        'tracemalloc': tracemalloc.is_tracing(),
+        'runs': runs,
+        'totals': {'spans': spans, 'cache': cache},
+    }, indent=1)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_prometheus():
+    """Process totals in the Prometheus text exposition format."""
+    with _lock:
+        spans = sorted(_span_totals.items())
+        cache = sorted(_cache_totals.items())
+    lines = [
+        '# HELP aqi_span_calls_total Completed instrumented spans.',
+        '# TYPE aqi_span_calls_total counter',
+    ]
+    lines += [f'aqi_span_calls_total{{span="{_label(n)}"}} {t[0]}' for n, t in spans]
+    lines += [
+        '# HELP aqi_span_seconds_total Wall time spent in instrumented spans.',
+        '# TYPE aqi_span_seconds_total counter',
+    ]
+    lines += [f'aqi_span_seconds_total{{span="{_label(n)}"}} {t[1]:.6f}' for n, t in spans]
+    lines += [
+        '# HELP aqi_span_net_alloc_bytes Net bytes allocated in spans while tracemalloc was on.',
+        '# TYPE aqi_span_net_alloc_bytes gauge',
+    ]
+    lines += [f'aqi_span_net_alloc_bytes{{span="{_label(n)}"}} {t[2]}' for n, t in spans]
+    lines += [
+        '# HELP aqi_cache_requests_total Cache lookups by cache and result.',
+        '# TYPE aqi_cache_requests_total counter',
+    ]
+    lines += [
+        f'aqi_cache_requests_total{{cache="{_label(c)}",result="{r}"}} {n}'
+        for (c, r), n in cache
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+if ENABLED and TRACEMALLOC:
+    set_tracing(True)
@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import pandas as pd
+from my_utils import columnar, data
+
+# Metadata sidecars for the large tables (row count, year range, column schema
+# and the first rows), written next to the data as <name>.meta.json. Pages that
+# only show these facts read the sidecar instead of parsing the table. A missing
+# or stale sidecar is rebuilt by a fast path that counts lines and reads only
+# the YEAR column and the preview rows.
+
+PREVIEW_ROWS = 15
+YEAR_COL = 'YEAR'
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def sidecar_path(name):
+    return os.path.splitext(data.data_path(name))[0] + '.meta.json'
+
+
+def count_rows(csv_path, block_size=1 << 20):
+    """Data rows in a CSV (lines minus the header), without parsing it."""
+    lines, last = 0, b'\n'
+    with open(csv_path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def _scan(name, preview_rows):
+    """(rows, years, schema, preview frame) using only the cheap parts of the table."""
+    path = data.data_path(name)
+    if columnar.is_fresh(path):
+        table = columnar.read_table(path)
+        columns = table.column_names
+        years = table.column(YEAR_COL).to_pandas() if YEAR_COL in columns else None
+        head = table.slice(0, preview_rows).to_pandas()
+        return table.num_rows, years, head.dtypes, head
+
+    kwargs = dict(data.DATASETS[name][1])
+    head = pd.read_csv(path, nrows=preview_rows, **kwargs)
+    years = None
+    if YEAR_COL in head.columns:
+        years = pd.read_csv(path, usecols=[YEAR_COL])[YEAR_COL]
+    return count_rows(path), years, head.dtypes, head
+
+
+def build_metadata(name='merged_data', preview_rows=PREVIEW_ROWS):
+    """Write the sidecar for ``name`` and return it."""
+    rows, years, dtypes, head = _scan(name, preview_rows)
+    mtime_ns, size = data.signature(name)
+    meta = {
+        'source': {'file': data.DATASETS[name][0], 'mtime_ns': mtime_ns, 'size': size},
+        'rows': int(rows),
+        'year_min': None if years is None else int(years.min()),
+        'year_max': None if years is None else int(years.max()),
+        'schema': {c: str(t) for c, t in dtypes.items()},
+        'preview': json.loads(head.to_json(orient='split', date_format='iso')),
+    }
+    path = sidecar_path(name)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp_path, path)
+    return meta
+
+
+def _is_current(meta, sig):
+    src = meta.get('source', {})
+    return (src.get('mtime_ns'), src.get('size')) == sig
+
+
+def load_metadata(name='merged_data'):
+    """Return the sidecar for ``name``, rebuilding it if the table has changed."""
+    sig = data.signature(name)
+    hit = _cache.get(name)
+    if hit is not None and _is_current(hit, sig):
+        return hit
+
+    with _lock:
+        hit = _cache.get(name)
+        if hit is not None and _is_current(hit, sig):
+            return hit
+        meta = None
+        path = sidecar_path(name)
+        if os.path.exists(path):
+            with open(path) as f:
+                meta = json.load(f)
+        if meta is None or not _is_current(meta, sig):
+            meta = build_metadata(name)
+        _cache[name] = meta
+        return meta
+
+
+def preview(name='merged_data'):
+    """The first rows of ``name`` as a DataFrame, from the sidecar."""
+    split = load_metadata(name)['preview']
+    return pd.DataFrame(split['data'], index=split['index'], columns=split['columns'])
+
+
+if __name__ == '__main__':
+    meta = build_metadata()
+    print(f"{meta['rows']:,} rows, {meta['year_min']}-{meta['year_max']} -> "
+          f"{sidecar_path('merged_data')}")
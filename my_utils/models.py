@@ -0,0 +1,154 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from my_utils import instrument
+
+# Model registry: discovers the pickles in Models/ and loads each one lazily,
+# once per process. Raw artifacts and the pipelines built on them share one
+# LRU, sized to hold every artifact in Models/ plus a pipeline per tuned model,
+# so cycling through the models never evicts and re-unpickles one; the LRU
+# only drops entries for pickles that are no longer there.
+# joblib and scikit-learn are imported on first load, so importing this module
+# (e.g. from app.py) stays cheap.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(BASE_DIR, '..', 'Models')
+
+# Fixed LRU size; None sizes it from the registry, see max_loaded()
+MAX_LOADED = None
+DEFAULT_MODEL = 'Ridge'
+
+# Every <name>_best model is stacked on these two artifacts
+PREPROCESSING = ('scaler', 'selector')
+MANIFEST = 'manifest.json'
+
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+_load_locks = {}
+_warmed = threading.Event()
+
+
+def artifact_paths():
+    """{artifact name: path} for every pickle in Models/."""
+    paths = glob.glob(os.path.join(MODEL_DIR, '*.pkl'))
+    return {os.path.splitext(os.path.basename(p))[0]: p for p in sorted(paths)}
+
+
+def available_models():
+    """Names of the tuned models, i.e. every ``<name>_best.pkl``."""
+    return [n[:-len('_best')] for n in artifact_paths() if n.endswith('_best')]
+
+
+def max_loaded():
+    """LRU size: every artifact plus one pipeline per ``<name>_best``, unless MAX_LOADED is set."""
+    if MAX_LOADED is not None:
+        return MAX_LOADED
+    paths = artifact_paths()
+    return len(paths) + sum(name.endswith('_best') for name in paths)
+
+
+def preprocessing_fingerprint(model_dir=None):
+    """Content hash of the scaler and selector pickles."""
+    digest = hashlib.sha1()
+    for name in PREPROCESSING:
+        with open(os.path.join(model_dir or MODEL_DIR, f'{name}.pkl'), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def check_preprocessing(name):
+    """Raise if the manifest says ``<name>_best`` was fitted on another scaler/selector.
+
+    Models without a manifest entry (or a fingerprint in it) are not checked.
+    """
+    path = os.path.join(MODEL_DIR, MANIFEST)
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        entry = json.load(f).get('models', {}).get(name) or {}
+    expected = entry.get('preprocessing')
+    if expected is not None and expected != preprocessing_fingerprint():
+        raise ValueError(
+            f"{name}_best.pkl was trained on a different scaler/selector than the ones in "
+            f"{MODEL_DIR}; retrain it with: python train_models.py --models {name}"
+        )
+
+
+def _cached(key, build):
+    with _lru_lock:
+        if key in _lru:
+            _lru.move_to_end(key)
+            instrument.cache_event('model', True)
+            return _lru[key]
+        lock = _load_locks.setdefault(key, threading.Lock())
+
+    # Loading happens outside the LRU lock so a slow unpickle of one model
+    # does not block lookups of the others.
+    with lock:
+        with _lru_lock:
+            if key in _lru:
+                _lru.move_to_end(key)
+                instrument.cache_event('model', True)
+                return _lru[key]
+        instrument.cache_event('model', False)
+        with instrument.span('model.load.' + '.'.join(map(str, key))):
+            obj = build()
+        limit = max_loaded()
+        with _lru_lock:
+            _lru[key] = obj
+            while len(_lru) > limit:
+                _lru.popitem(last=False)
+        return obj
+
+
+def load_artifact(name):
+    """Unpickle ``Models/<name>.pkl`` once and return the shared object."""
+    path = artifact_paths().get(name)
+    if path is None:
+        raise KeyError(f"No artifact named {name!r} in {MODEL_DIR}")
+    def build():
+        import joblib
+        return joblib.load(path)
+    return _cached(('artifact', name), build)
+
+
+def get_pipeline(name):
+    """Fused scaler -> selector -> ``<name>_best`` pipeline."""
+    def build():
+        from sklearn.pipeline import Pipeline
+        check_preprocessing(name)
+        return Pipeline([
+            ('scaler', load_artifact('scaler')),
+            ('selector', load_artifact('selector')),
+            ('model', load_artifact(f"{name}_best")),
+        ])
+    return _cached(('pipeline', name), build)
+
+
+def clear():
+    with _lru_lock:
+        _lru.clear()
+    _warmed.clear()
+
+
+def warm_up(names=(DEFAULT_MODEL,), background=True):
+    """Preload pipelines so the first prediction does not pay for unpickling.
+
+    Safe to call on every Streamlit rerun: only the first call does any work.
+    """
+    if _warmed.is_set():
+        return
+    _warmed.set()
+
+    def run():
+        for name in names:
+            if name in available_models():
+                get_pipeline(name)
+
+    if background:
+        threading.Thread(target=run, name='model-warm-up', daemon=True).start()
+    else:
+        run()
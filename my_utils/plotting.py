@@ -0,0 +1,95 @@
+import threading
+import numpy as np
+from my_utils import data, instrument
+
+# Precomputed plotting arrays for the Actual vs Predicted charts and the raw
+# point overlays on the visualization page. The 2-D histograms and the
+# stratified samples are derived once per version of their source file and
+# reused by every rerun and session.
+
+DEFAULT_BINS = 80
+DEFAULT_POINT_BUDGET = 3000
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _cached(key, build, name='model_predictions'):
+    sig = data.signature(name)
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None and hit[0] == sig:
+            instrument.cache_event('plot', True)
+            return hit[1]
+    instrument.cache_event('plot', False)
+    with instrument.span(f'plot.build.{key[0]}'):
+        value = build()
+    with _lock:
+        _cache[key] = (sig, value)
+    return value
+
+
+def prediction_density(bins=DEFAULT_BINS):
+    """{model: (counts, edges)} 2-D histograms of (Actual, Predicted) on one shared grid."""
+    def build():
+        preds = data.load_predictions()
+        pred_cols = [c for c in preds.columns if c.endswith('_Pred')]
+        actual = preds['Actual'].to_numpy(dtype='float64')
+        lo = min(actual.min(), preds[pred_cols].min().min())
+        hi = max(actual.max(), preds[pred_cols].max().max())
+        edges = np.linspace(lo, hi, bins + 1)
+        out = {}
+        for col in pred_cols:
+            counts, _, _ = np.histogram2d(
+                actual, preds[col].to_numpy(dtype='float64'), bins=[edges, edges]
+            )
+            out[col[:-len('_Pred')]] = (counts, edges)
+        return out
+    return _cached(('density', bins), build)
+
+
+def stratified_sample(values, budget, strata=20, seed=0):
+    """Row positions of a deterministic sample of ``values``, stratified by value.
+
+    ``values`` is cut into ``strata`` equal-width bands between its min and max
+    (NaNs form a band of their own). Half the budget is split evenly over the
+    non-empty bands, each keeping all of its rows if it has fewer; the rest is
+    shared in proportion to band size. Sparse extreme bands are therefore
+    oversampled and stay visible, while the bulk keeps its shape.
+    """
+    values = np.asarray(values, dtype='float64')
+    n = len(values)
+    if budget >= n:
+        return np.arange(n)
+    nan = np.isnan(values)
+    band = np.full(n, strata)
+    if not nan.all():
+        edges = np.linspace(np.nanmin(values), np.nanmax(values), strata + 1)
+        band[~nan] = np.clip(np.searchsorted(edges, values[~nan], side='right') - 1, 0, strata - 1)
+    sizes = np.bincount(band, minlength=strata + 1)
+    floor = np.minimum(sizes, budget // (2 * np.count_nonzero(sizes)))
+    spare = sizes - floor
+    share = np.floor((budget - floor.sum()) * spare / spare.sum()).astype(int)
+    take = floor + share
+
+    rng = np.random.default_rng(seed)
+    order = np.argsort(band, kind='stable')
+    picked = [
+        rng.choice(members, k, replace=False)
+        for members, k in zip(np.split(order, np.cumsum(sizes)[:-1]), take) if k
+    ]
+    return np.sort(np.concatenate(picked))
+
+
+def prediction_sample(budget=DEFAULT_POINT_BUDGET):
+    """Row positions of model_predictions_tuned.csv to draw, stratified by Actual AQI."""
+    def build():
+        return stratified_sample(data.load_predictions()['Actual'], budget)
+    return _cached(('sample', budget), build)
+
+
+def eda_sample(budget=DEFAULT_POINT_BUDGET):
+    """Row positions of the EDA frame to draw as raw points, stratified by AQI."""
+    def build():
+        return stratified_sample(data.load_eda()['AQI'], budget)
+    return _cached(('eda_sample', budget), build, name='merged_data_eda')
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+from my_utils import features, flattrees, instrument, models, stats
+from my_utils.features import CATEGORY_BINS, CATEGORY_LABELS, categorize
+
+# Vectorized prediction: one scaler -> selector -> model call for any number of
+# rows, with features the caller does not supply filled from training medians.
+
+# Features a user is asked for; the rest of scaler.feature_names_in_ is filled in
+INPUT_FEATURES = [
+    'PM2.5', 'PM10', 'SO2', 'NO2', 'CO',
+    'O3', 'DEWP', 'WSPM', 'Vehicular_Pollution'
+]
+
+# Tree models answer requests of up to this many rows from their flat arrays
+# (see flattrees.py), which skip scikit-learn's per-call overhead; larger
+# batches go through the pipeline, whose compiled traversal is faster per row
+FLAT_MAX_ROWS = 500
+
+# code column -> categorical column it is derived from (codes come from features.CODE_MAPS)
+CODE_SOURCES = {f'{col}_code': col for col in features.CODE_MAPS}
+
+
+def feature_names():
+    return list(models.load_artifact('scaler').feature_names_in_)
+
+
+def feature_medians(station=None):
+    """Training median of every model feature, read from the precomputed stats artifact."""
+    if station is None:
+        feats = stats.load_feature_stats()['features']
+    else:
+        feats = stats.load_feature_stats()['by_station'][station]
+    return pd.Series({c: feats[c]['median'] for c in feature_names()}, dtype='float64')
+
+
+def check_columns(frame):
+    """Return (missing, extra): model features absent from ``frame`` and columns the model ignores."""
+    names = feature_names()
+    present = set(frame.columns)
+    # A raw categorical column stands in for its code column
+    present |= {code for code, src in CODE_SOURCES.items() if src in present}
+    missing = [c for c in names if c not in present]
+    extra = [c for c in frame.columns if c not in names and c not in CODE_SOURCES.values()]
+    return missing, extra
+
+
+def prepare_features(frame):
+    """Build the model input matrix (columns = scaler.feature_names_in_) for every row of ``frame``."""
+    names = feature_names()
+    medians = feature_medians()
+    missing, _ = check_columns(frame)
+    if len(missing) == len(names):
+        raise ValueError(
+            "None of the model features were found. Expected columns: " + ", ".join(names)
+        )
+
+    codes = features.encode(frame)
+    cols = {}
+    for c in names:
+        if c in frame.columns:
+            col = pd.to_numeric(frame[c], errors='coerce')
+        elif c in codes:
+            # Unseen category values (code -1) fall back to the median as well
+            col = codes[c].astype('float64').where(codes[c] >= 0)
+        else:
+            cols[c] = medians[c]
+            continue
+        cols[c] = col.fillna(medians[c]).astype('float64')
+    return pd.DataFrame(cols, index=frame.index, columns=names)
+
+
+def predict_batch(frame, model_name):
+    """Predict AQI and AQI category for every row of ``frame`` in one vectorized call."""
+    with instrument.span('predict.features'):
+        X = prepare_features(frame)
+    if len(X) == 0:
+        # scikit-learn rejects zero-row input; an empty frame has nothing to score
+        ypred = np.empty(0)
+        return pd.DataFrame(
+            {'AQI_pred': ypred, 'AQI_Category_pred': categorize(ypred)},
+            index=frame.index
+        )
+    if model_name in flattrees.TREE_MODELS and len(X) <= FLAT_MAX_ROWS:
+        predictor = flattrees.load(model_name)
+    else:
+        predictor = models.get_pipeline(model_name)
+    with instrument.span(f'predict.model.{model_name}'):
+        ypred = predictor.predict(X)
+    return pd.DataFrame(
+        {'AQI_pred': ypred, 'AQI_Category_pred': categorize(ypred)},
+        index=frame.index
+    )
@@ -0,0 +1,42 @@
+import inspect
+import streamlit as st
+
+# Shims for keywords and elements newer than the oldest Streamlit this repo
+# supports (requirements.txt: streamlit>=1.20.0). Each one uses the newer API
+# when the installed version has it and the 1.20 equivalent otherwise.
+
+
+def _accepts(fn, name):
+    try:
+        return name in inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+# use_container_width replaced use_column_width for st.image in 1.40
+_IMAGE_WIDTH = 'use_container_width' if _accepts(st.image, 'use_container_width') \
+    else 'use_column_width'
+
+
+def image(data):
+    """st.image stretched to the width of its container."""
+    st.image(data, **{_IMAGE_WIDTH: True})
+
+
+# hide_index arrived in 1.23
+_HIDE_INDEX = _accepts(st.dataframe, 'hide_index')
+
+
+def dataframe(df, **kwargs):
+    """st.dataframe without the index column; on 1.20 the index is only reset."""
+    if _HIDE_INDEX:
+        return st.dataframe(df, hide_index=True, **kwargs)
+    return st.dataframe(df.reset_index(drop=True), **kwargs)
+
+
+def toast(message):
+    """st.toast (1.27+), or an inline warning where it does not exist."""
+    if hasattr(st, 'toast'):
+        st.toast(message)
+    else:
+        st.warning(message)
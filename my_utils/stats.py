@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from my_utils import data, features
+
+# Precomputed per-feature statistics (overall and per station) for the EDA
+# frame, stored in Data_set/feature_stats.json, together with the aggregates
+# behind the weather charts: per-season box statistics of TEMP and DEWP and
+# AQI quantiles per rainfall bin. Readers get the artifact instead of scanning
+# 175k rows; it is rebuilt only when the source (or the artifact layout) changes.
+
+STATS_PATH = os.path.join(data.DATA_DIR, 'feature_stats.json')
+
+QUANTILES = [0.0, 0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99, 1.0]
+_QUANTILE_KEYS = ['min', 'q01', 'q05', 'q25', 'median', 'q75', 'q95', 'q99', 'max']
+
+# Bumped whenever the artifact gains or changes sections
+STATS_VERSION = 2
+
+BOX_COLS = ['TEMP', 'DEWP']
+# Rainfall bin edges in mm; dry hours (RAIN == 0) get a bin of their own
+RAIN_EDGES = [0.0, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, np.inf]
+RAIN_QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+_RAIN_KEYS = ['q10', 'q25', 'median', 'q75', 'q90']
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _reported(values, dtype):
+    if dtype == np.float32:
+        # Report float32 columns (see my_utils/columnar.py) at their own
+        # precision, so 67.2 is not written out as 67.19999694824219.
+        return [float(str(np.float32(v))) for v in values]
+    return [float(v) for v in values]
+
+
+def _describe(values, dtype):
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {'count': 0}
+    qs = _reported(np.quantile(values, QUANTILES), dtype)
+    out = {'count': int(len(values)), 'mean': float(values.mean())}
+    out.update({k: float(q) for k, q in zip(_QUANTILE_KEYS, qs)})
+    return out
+
+
+def _box(values, dtype):
+    """matplotlib bxp() statistics: quartiles and whiskers at the furthest
+    points within 1.5 IQR, as seaborn's boxplot draws them."""
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None
+    q1, med, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    box = dict(zip(
+        ['q1', 'med', 'q3', 'whislo', 'whishi'],
+        _reported([q1, med, q3, inside.min(), inside.max()], dtype),
+    ))
+    box.update({'mean': float(values.mean()), 'count': int(len(values)),
+                'n_fliers': int(len(values) - len(inside))})
+    return box
+
+
+def _season_boxes(df):
+    season = df['SEASONS'].astype(str).to_numpy()
+    return {
+        col: {
+            name: _box(df[col].to_numpy(dtype='float64')[season == name], df[col].dtype)
+            for name in sorted(set(season))
+        }
+        for col in BOX_COLS if col in df.columns
+    }
+
+
+def _rain_bins(df):
+    rain = df['RAIN'].to_numpy(dtype='float64')
+    aqi = df['AQI'].to_numpy(dtype='float64')
+    ok = ~(np.isnan(rain) | np.isnan(aqi))
+    rain, aqi = rain[ok], aqi[ok]
+    bins = []
+    masks = [('0', rain == 0)]
+    for lo, hi in zip(RAIN_EDGES[:-1], RAIN_EDGES[1:]):
+        label = f'{lo:g}-{hi:g}' if np.isfinite(hi) else f'>{lo:g}'
+        masks.append((label, (rain > lo) & (rain <= hi)))
+    for label, mask in masks:
+        if not mask.any():
+            continue
+        qs = np.quantile(aqi[mask], RAIN_QUANTILES)
+        row = {'bin': label, 'count': int(mask.sum()),
+               'rain_mean': float(rain[mask].mean()), 'mean': float(aqi[mask].mean())}
+        row.update({k: float(q) for k, q in zip(_RAIN_KEYS, qs)})
+        bins.append(row)
+    return bins
+
+
+def _feature_columns(df):
+    cols = {c: df[c] for c in df.select_dtypes(include='number').columns}
+    # Category codes, as used by the scaler (WD_code, STATION_code, ...)
+    cols.update(features.encode(df))
+    return cols
+
+
+def build_feature_stats(df=None):
+    """Compute the stats artifact for the EDA frame and write it to STATS_PATH."""
+    if df is None:
+        df = data.load_eda()
+    cols = _feature_columns(df)
+    arrays = {c: s.to_numpy(dtype='float64') for c, s in cols.items()}
+    dtypes = {c: s.dtype for c, s in cols.items()}
+
+    by_station = {}
+    if 'STATION' in df.columns:
+        station = df['STATION'].to_numpy()
+        for name in df['STATION'].cat.categories:
+            mask = station == name
+            by_station[str(name)] = {
+                c: _describe(a[mask], dtypes[c]) for c, a in arrays.items()
+            }
+
+    mtime_ns, size = data.signature('merged_data_eda')
+    stats = {
+        'version': STATS_VERSION,
+        'source': {'file': data.DATASETS['merged_data_eda'][0],
+                   'mtime_ns': mtime_ns, 'size': size},
+        'rows': int(len(df)),
+        'features': {c: _describe(a, dtypes[c]) for c, a in arrays.items()},
+        'by_station': by_station,
+        'season_boxes': _season_boxes(df) if 'SEASONS' in df.columns else {},
+        'rain_aqi': _rain_bins(df) if {'RAIN', 'AQI'} <= set(df.columns) else [],
+    }
+    tmp_path = STATS_PATH + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(stats, f, indent=1)
+    os.replace(tmp_path, STATS_PATH)
+    return stats
+
+
+def _is_current(stats, sig):
+    src = stats.get('source', {})
+    return stats.get('version') == STATS_VERSION and (src.get('mtime_ns'), src.get('size')) == sig
+
+
+def load_feature_stats():
+    """Return the stats artifact, rebuilding it if the EDA data has changed."""
+    sig = data.signature('merged_data_eda')
+    hit = _cache.get('stats')
+    if hit is not None and _is_current(hit, sig):
+        return hit
+
+    with _lock:
+        hit = _cache.get('stats')
+        if hit is not None and _is_current(hit, sig):
+            return hit
+        stats = None
+        if os.path.exists(STATS_PATH):
+            with open(STATS_PATH) as f:
+                stats = json.load(f)
+        if stats is None or not _is_current(stats, sig):
+            stats = build_feature_stats()
+        _cache['stats'] = stats
+        return stats
+
+
+def feature_stats(feature, station=None):
+    """Stats dict (min/max/median/quantiles/...) for one feature, optionally for one station."""
+    stats = load_feature_stats()
+    if station is None:
+        return stats['features'][feature]
+    return stats['by_station'][station][feature]
+
+
+def season_boxes(feature):
+    """{season: bxp() stats dict} for one of BOX_COLS."""
+    return load_feature_stats()['season_boxes'][feature]
+
+
+def rain_aqi_bins():
+    """DataFrame of AQI mean and quantiles per rainfall bin, indexed by bin label."""
+    return pd.DataFrame(load_feature_stats()['rain_aqi']).set_index('bin')
+
+
+if __name__ == '__main__':
+    stats = build_feature_stats()
+    print(f"Wrote stats for {len(stats['features'])} features over {stats['rows']:,} rows "
+          f"to {STATS_PATH}")
@@ -0,0 +1,146 @@
+import glob
+import os
+import re
+import pandas as pd
+
+# Partitioned on-disk store for hourly data, one directory per station and year:
+#
+#   Data_set/hourly_store/STATION=<name>/YEAR=<yyyy>/part-<start>-<end>.parquet
+#
+# New data is appended as extra part files, so writers never rewrite what is
+# already there and readers can pick only the partitions they need. Queries by
+# time range also skip part files whose name lies outside the range and push
+# the range down to the Parquet reader as a row filter.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.path.join(BASE_DIR, '..', 'Data_set', 'hourly_store')
+
+INDEX_COL = 'DATETIME'
+
+# Rows per Parquet row group: one week of hours, so the reader can skip
+# everything outside a short time range using the row-group statistics.
+ROW_GROUP_ROWS = 24 * 7
+
+_PART_RE = re.compile(r'part-(\d{8}T\d{2})-(\d{8}T\d{2})')
+
+
+def partition_dir(station, year, store_dir=None):
+    return os.path.join(store_dir or STORE_DIR, f'STATION={station}', f'YEAR={int(year)}')
+
+
+def partitions(store_dir=None):
+    """Sorted list of (station, year) pairs present in the store."""
+    pattern = os.path.join(store_dir or STORE_DIR, 'STATION=*', 'YEAR=*')
+    found = []
+    for path in glob.glob(pattern):
+        station = os.path.basename(os.path.dirname(path))[len('STATION='):]
+        year = int(os.path.basename(path)[len('YEAR='):])
+        found.append((station, year))
+    return sorted(found)
+
+
+def part_files(station, year, store_dir=None):
+    return sorted(glob.glob(os.path.join(partition_dir(station, year, store_dir), '*.parquet')))
+
+
+def part_span(path):
+    """(first, last) timestamp covered by a part file, from its name."""
+    match = _PART_RE.search(os.path.basename(path))
+    return tuple(pd.to_datetime(t, format='%Y%m%dT%H') for t in match.groups())
+
+
+def exists(store_dir=None):
+    return bool(partitions(store_dir))
+
+
+def signature(store_dir=None):
+    """(latest mtime_ns, number of part files); changes whenever data is appended."""
+    files = glob.glob(os.path.join(store_dir or STORE_DIR, 'STATION=*', 'YEAR=*', '*.parquet'))
+    if not files:
+        raise FileNotFoundError(f"No hourly store at {store_dir or STORE_DIR}")
+    return (max(os.stat(f).st_mtime_ns for f in files), len(files))
+
+
+def _write_part(df, station, year, store_dir):
+    directory = partition_dir(station, year, store_dir)
+    os.makedirs(directory, exist_ok=True)
+    start, end = df.index.min(), df.index.max()
+    name = f"part-{start:%Y%m%dT%H}-{end:%Y%m%dT%H}"
+    path = os.path.join(directory, name + '.parquet')
+    n = 1
+    while os.path.exists(path):
+        n += 1
+        path = os.path.join(directory, f"{name}-{n}.parquet")
+    tmp_path = path + '.tmp'
+    df.to_parquet(tmp_path, index=True, row_group_size=ROW_GROUP_ROWS)
+    os.replace(tmp_path, path)
+    return path
+
+
+def append(df, store_dir=None):
+    """Append hourly rows (DatetimeIndex, STATION column) to their station/year partitions."""
+    written = []
+    years = df.index.year
+    for (station, year), part in df.groupby([df['STATION'].astype(str), years], sort=True):
+        written.append(_write_part(part.sort_index(), station, year, store_dir))
+    return written
+
+
+def read_partition(station, year, columns=None, store_dir=None, start=None, end=None):
+    """Rows of one partition, optionally only those with start <= time <= end."""
+    filters = []
+    if start is not None:
+        filters.append((INDEX_COL, '>=', pd.Timestamp(start)))
+    if end is not None:
+        filters.append((INDEX_COL, '<=', pd.Timestamp(end)))
+    frames = []
+    for f in part_files(station, year, store_dir):
+        first, last = part_span(f)
+        if (start is not None and last < pd.Timestamp(start)) or \
+                (end is not None and first > pd.Timestamp(end)):
+            continue
+        frames.append(pd.read_parquet(f, columns=columns, filters=filters or None))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames).sort_index()
+
+
+def load(stations=None, years=None, columns=None, store_dir=None, start=None, end=None):
+    """Concatenate the selected partitions into one frame ordered by time, then station.
+
+    Only partitions matching ``stations``, ``years`` and the [start, end] time
+    range are opened, and only ``columns`` are read from them.
+    """
+    first_year = None if start is None else pd.Timestamp(start).year
+    last_year = None if end is None else pd.Timestamp(end).year
+    frames = []
+    for station, year in partitions(store_dir):
+        if stations is not None and station not in stations:
+            continue
+        if years is not None and year not in years:
+            continue
+        if (first_year is not None and year < first_year) or \
+                (last_year is not None and year > last_year):
+            continue
+        frames.append(read_partition(station, year, columns, store_dir, start, end))
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames)
+    # Part files carry their own category dictionaries; re-derive one per column
+    for c in df.columns:
+        if isinstance(df[c].dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(df[c]):
+            df[c] = df[c].astype(str).where(df[c].notna()).astype('category')
+    sort_cols = ['STATION'] if 'STATION' in df.columns else []
+    return df.sort_values(sort_cols, kind='stable').sort_index(kind='stable')
+
+
+if __name__ == '__main__':
+    # python -m my_utils.store  ->  partition the EDA data into an empty store
+    from my_utils import data
+
+    if exists():
+        print(f"{STORE_DIR} already holds data; ingest new hours with my_utils.ingest")
+    else:
+        written = append(data.load_eda())
+        print(f"Wrote {len(written)} part files to {STORE_DIR}")
@@ -0,0 +1,272 @@
+import io
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+from my_utils import data, features, instrument, models, predict
+from my_utils.ingest import RAW_RENAME
+
+# Streaming mode: hourly station readings arrive from a source (a replay of
+# merged_data.csv at accelerated speed, or the tail of a CSV another process
+# appends to). Each batch gets its AQI and category computed row by row, is
+# scored by the frozen Ridge_best pipeline and by an online SGDRegressor (which
+# predicts first and then learns from the batch with partial_fit), and is
+# checked for AQI threshold crossings. Recent rows and alerts live in
+# fixed-size ring buffers, so a stream that runs for days uses bounded memory.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Only CSVs under this directory can be followed, so the page cannot be used
+# to read other files on the server
+STREAM_DIR = os.environ.get('AQI_STREAM_DIR') or os.path.join(BASE_DIR, '..', 'Data_set', 'stream')
+
+BUFFER_ROWS = 2000
+MAX_ALERTS = 50
+MAX_BATCH = 5000
+BASELINE_MODEL = 'Ridge'
+SEED = 42
+
+# An alert fires when a station's AQI rises across one of these levels
+# (the lower bounds of Unhealthy for Sensitive Groups .. Hazardous). A level
+# only re-arms once the AQI has fallen ALERT_HYSTERESIS points below it, so a
+# reading hovering around a level does not alert every other hour.
+ALERT_LEVELS = features.CATEGORY_BINS[2:-1]
+ALERT_HYSTERESIS = 20
+
+BUFFER_COLS = ['DATETIME', 'STATION', 'AQI', 'Baseline_Pred', 'Online_Pred']
+TIME_PARTS = ['YEAR', 'MONTH', 'DAY', 'HOUR']
+READING_RENAME = {**RAW_RENAME, **{p.lower(): p for p in TIME_PARTS}}
+
+_replay_cache = {}
+_replay_lock = threading.Lock()
+
+
+def readings_frame(df):
+    """Time-indexed, time-sorted readings from merged_data / raw PRSA style rows."""
+    df = df.rename(columns=READING_RENAME)
+    if 'DATETIME' in df.columns:
+        index = pd.to_datetime(df['DATETIME'])
+        df = df.drop(columns='DATETIME')
+    else:
+        index = pd.to_datetime(df[TIME_PARTS].rename(columns=str.lower))
+    df.index = pd.DatetimeIndex(index, name='DATETIME')
+    return df.sort_index(kind='stable')
+
+
+def missing_columns(columns):
+    """Columns a readings file needs (merged_data or raw PRSA names) that ``columns`` lacks."""
+    names = {READING_RENAME.get(c, c) for c in columns}
+    missing = [p for p in features.POLLUTANTS if p not in names]
+    if 'DATETIME' not in names and not set(TIME_PARTS) <= names:
+        missing.append('DATETIME (or year, month, day, hour)')
+    return missing
+
+
+def stream_path(name):
+    """Real path of ``name`` inside STREAM_DIR; ValueError for anything outside it."""
+    root = os.path.realpath(STREAM_DIR)
+    path = os.path.realpath(os.path.join(root, name))
+    if path == root or os.path.commonpath([root, path]) != root:
+        raise ValueError(f"Only files under {root} can be followed.")
+    return path
+
+
+def _empty():
+    return pd.DataFrame(index=pd.DatetimeIndex([], name='DATETIME'))
+
+
+# --- sources ---------------------------------------------------------------
+
+def replay_frame():
+    """merged_data in time order, shared by every replay in the process."""
+    sig = data.signature('merged_data')
+    with _replay_lock:
+        hit = _replay_cache.get('merged_data')
+        if hit is None or hit[0] != sig:
+            hit = (sig, readings_frame(data.load('merged_data')))
+            _replay_cache['merged_data'] = hit
+        return hit[1]
+
+
+class ReplaySource:
+    """Historical readings released at ``speed`` simulated hours per wall-clock second."""
+
+    def __init__(self, frame=None, speed=6.0, clock=time.monotonic):
+        self.frame = replay_frame() if frame is None else frame
+        self.speed = speed
+        self.clock = clock
+        self._t0 = None
+        self._pos = 0
+
+    @property
+    def done(self):
+        return self._pos >= len(self.frame)
+
+    def poll(self, max_rows=MAX_BATCH):
+        if self._t0 is None:
+            self._t0 = self.clock()
+        if self.done:
+            return self.frame.iloc[:0]
+        # Whole simulated seconds, so the bound has the index's time unit
+        elapsed = int((self.clock() - self._t0) * self.speed * 3600)
+        now = self.frame.index[0] + pd.Timedelta(seconds=elapsed)
+        end = min(int(self.frame.index.searchsorted(now, side='right')), self._pos + max_rows)
+        rows = self.frame.iloc[self._pos:end]
+        self._pos = end
+        return rows
+
+
+class FileTailSource:
+    """Rows appended to a CSV (with a header line) since the previous poll.
+
+    Starts at the current end of the file unless ``from_start``; a file that
+    shrinks (rotated or rewritten) is read again from its first row. A header
+    without the reading columns raises ValueError. Each poll reads at most
+    ``max_rows`` lines, so a large backlog is consumed over several polls.
+    """
+
+    def __init__(self, path, from_start=False):
+        self.path = path
+        self.from_start = from_start
+        self.done = False
+        self._header = None
+        self._offset = None
+
+    def poll(self, max_rows=MAX_BATCH):
+        if not os.path.exists(self.path):
+            return _empty()
+        size = os.path.getsize(self.path)
+        with open(self.path, 'rb') as f:
+            if self._offset is None or size < self._offset:
+                header = f.readline()
+                if not header.endswith(b'\n'):
+                    return _empty()
+                missing = missing_columns(pd.read_csv(io.BytesIO(header), nrows=0).columns)
+                if missing:
+                    raise ValueError(
+                        f"{os.path.basename(self.path)} is missing the columns: {', '.join(missing)}"
+                    )
+                self._header = header
+                start_at_end = self._offset is None and not self.from_start
+                self._offset = size if start_at_end else len(header)
+            f.seek(self._offset)
+            lines = []
+            while len(lines) < max_rows:
+                line = f.readline()
+                # Only complete lines; a line still being written is read next time
+                if not line.endswith(b'\n'):
+                    break
+                lines.append(line)
+        if not lines:
+            return _empty()
+        body = b''.join(lines)
+        self._offset += len(body)
+        return readings_frame(pd.read_csv(io.BytesIO(self._header + body)))
+
+
+# --- online model and stream -----------------------------------------------
+
+class OnlineModel:
+    """SGDRegressor updated with partial_fit on the frozen scaler -> selector features."""
+
+    def __init__(self):
+        from sklearn.linear_model import SGDRegressor
+
+        self.model = SGDRegressor(
+            alpha=1e-4, learning_rate='invscaling', eta0=0.01, random_state=SEED
+        )
+        self.updates = 0
+
+    def _transform(self, X):
+        scaled = models.load_artifact('scaler').transform(X)
+        return models.load_artifact('selector').transform(scaled)
+
+    def predict(self, X):
+        if not self.updates:
+            return np.full(len(X), np.nan)
+        return self.model.predict(self._transform(X))
+
+    def partial_fit(self, X, y):
+        self.model.partial_fit(self._transform(X), y)
+        self.updates += 1
+
+
+class Stream:
+    def __init__(self, source, buffer_rows=BUFFER_ROWS, max_alerts=MAX_ALERTS,
+                 baseline=BASELINE_MODEL):
+        self.source = source
+        self.baseline = baseline
+        self.online = OnlineModel()
+        self.buffer = deque(maxlen=buffer_rows)
+        self.alerts = deque(maxlen=max_alerts)
+        self.alert_count = 0
+        self.rows = 0
+        self._abs_err = {'baseline': 0.0, 'online': 0.0}
+        self._scored = 0
+        self._level = {}      # station -> number of ALERT_LEVELS currently raised
+
+    def _check_alerts(self, frame, stations):
+        aqi = frame['AQI'].to_numpy(dtype='float64')
+        levels = np.searchsorted(ALERT_LEVELS, aqi, side='right')
+        categories = frame['AQI_Category'].astype(str).to_numpy()
+        for i, (station, value, level) in enumerate(zip(stations, aqi, levels)):
+            raised = self._level.get(station, 0)
+            if level > raised:
+                self.alerts.append({
+                    'DATETIME': frame.index[i],
+                    'STATION': station,
+                    'AQI': float(value),
+                    'level': ALERT_LEVELS[level - 1],
+                    'category': categories[i],
+                })
+                self.alert_count += 1
+                raised = level
+            while raised and value < ALERT_LEVELS[raised - 1] - ALERT_HYSTERESIS:
+                raised -= 1
+            self._level[station] = raised
+
+    def step(self, max_rows=MAX_BATCH):
+        """Pull, score, learn from and buffer the readings available now; returns their count."""
+        readings = self.source.poll(max_rows)
+        if readings.empty:
+            return 0
+        with instrument.span('stream.step'):
+            frame = features.engineer(readings)
+            frame = frame[frame['AQI'].notna()]
+            if frame.empty:
+                return 0
+            X = predict.prepare_features(frame)
+            y = frame['AQI'].to_numpy(dtype='float64')
+            baseline = models.get_pipeline(self.baseline).predict(X)
+            # Predict before learning, so the online error is measured on unseen rows
+            online = self.online.predict(X)
+            self.online.partial_fit(X, y)
+
+            if not np.isnan(online).any():
+                self._abs_err['baseline'] += float(np.abs(baseline - y).sum())
+                self._abs_err['online'] += float(np.abs(online - y).sum())
+                self._scored += len(y)
+            if 'STATION' in frame.columns:
+                stations = frame['STATION'].astype(str).to_numpy()
+            else:
+                stations = np.full(len(y), '')
+            self._check_alerts(frame, stations)
+            self.buffer.extend(zip(frame.index, stations, y, baseline, online))
+            self.rows += len(y)
+        return len(y)
+
+    def frame(self):
+        """The ring buffer as a DataFrame indexed by DATETIME."""
+        return pd.DataFrame(list(self.buffer), columns=BUFFER_COLS).set_index('DATETIME')
+
+    def metrics(self):
+        n = self._scored
+        return {
+            'rows': self.rows,
+            'updates': self.online.updates,
+            'alerts': self.alert_count,
+            'baseline_mae': self._abs_err['baseline'] / n if n else None,
+            'online_mae': self._abs_err['online'] / n if n else None,
+        }
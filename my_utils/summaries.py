@@ -0,0 +1,365 @@
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from my_utils import data
+
+# Builds the yearly/monthly/weekly/daily/seasonal summary CSVs from the hourly
+# EDA frame. One grouped pass reduces the hours to per-day, per-station running
+# sums and counts, which are persisted; every coarser table is derived from
+# those, so appending new hours only touches the days (and weeks, months, ...)
+# they fall in. The same state also yields the station x year and station x
+# month tables, whose confidence intervals come from the kept sums of squares.
+# A second, small state keeps sums and counts per (station, weekday, hour) for
+# the hour-of-day x station and weekday x hour pattern tables.
+#
+# The state, the cube and a JSON sidecar are written next to the tables they
+# describe (Data_set/ unless out_dir says otherwise). The sidecar records the state format version and, per station, the latest
+# hour folded in. update_summaries() skips rows at or before that hour, so
+# folding the same hours twice does not count them twice, and rebuilds
+# everything from the EDA frame when the state was written by an older version.
+#
+# When a station or pattern CSV was never built, the page derives it from the
+# EDA frame; that state and cube are kept per process, keyed on the EDA
+# signature, so the EDA frame is reduced once rather than on every chart miss.
+
+STATE_FILE = 'summary_state.feather'
+CUBE_FILE = 'hourly_state.feather'
+META_FILE = 'summary_state.json'
+
+# Bump when the state or cube layout changes (2: sums of squares for the CIs,
+# the hour cube, per-station folded hours)
+SUMMARY_VERSION = 2
+
+SUMMARY_COLS = [
+    'NO', 'PM2.5', 'PM10', 'SO2', 'NO2', 'CO', 'O3',
+    'TEMP', 'PRES', 'DEWP', 'RAIN', 'WSPM', 'AQI',
+    'Vehicular_Pollution', 'Industrial_Pollution'
+]
+PERIODS = ['yearly', 'monthly', 'weekly', 'daily', 'seasonal']
+STATE_KEYS = ['DATE', 'SEASONS', 'STATION']
+
+# Station tables: mean, count and normal-approximation 95% CI per station and period
+STATION_PERIODS = ['yearly', 'monthly']
+CI_COLS = ['AQI']
+CI_Z = 1.96
+
+# Hourly pattern tables: name -> index levels, all derived from the hour cube
+CUBE_KEYS = ['STATION', 'WEEKDAY', 'HOUR']
+PATTERN_TABLES = {
+    'hour_station': ['HOUR', 'STATION'],
+    'weekday_hour': ['WEEKDAY', 'HOUR'],
+}
+
+
+_derived = {}
+_derived_lock = threading.Lock()
+
+
+def _path(name, out_dir=None):
+    return os.path.join(out_dir or data.DATA_DIR, name)
+
+
+def _period_labels(days, period):
+    """Bucket label for each day, matching the resample labels of the original tables."""
+    days = pd.DatetimeIndex(days)
+    if period == 'daily':
+        return days
+    if period == 'weekly':
+        # Weeks end on Sunday
+        return days + pd.to_timedelta((6 - days.dayofweek) % 7, unit='D')
+    if period == 'monthly':
+        return days + pd.offsets.MonthEnd(0)
+    if period == 'yearly':
+        return days + pd.offsets.YearEnd(0)
+    raise ValueError(f"Unknown period {period!r}")
+
+
+def accumulate(df):
+    """Reduce hourly rows to one row per (day, season, station) of running sums and counts."""
+    cols = [c for c in SUMMARY_COLS if c in df.columns]
+    keys = [
+        df.index.normalize().rename('DATE'),
+        df['SEASONS'].astype(str).rename('SEASONS'),
+        df['STATION'].astype(str).rename('STATION'),
+    ]
+    # Sums are kept in float64 even for float32 columns so they stay exact enough to append to
+    values = df[cols].astype('float64')
+    agg = values.groupby(keys).agg(['sum', 'count'])
+    agg.columns = [f'{stat}:{col}' for col, stat in agg.columns]
+    ci_cols = [c for c in CI_COLS if c in cols]
+    sumsq = (values[ci_cols] ** 2).groupby(keys).sum()
+    sumsq.columns = [f'sumsq:{c}' for c in ci_cols]
+    return agg.join(sumsq).reset_index()
+
+
+def merge_state(state, new):
+    """Add the sums and counts of ``new`` into ``state``."""
+    if state is None or state.empty:
+        return new
+    merged = pd.concat([state, new], ignore_index=True)
+    return merged.groupby(STATE_KEYS, as_index=False).sum()
+
+
+def _means(state, keys):
+    sums = state.filter(like='sum:').groupby(keys).sum()
+    counts = state.filter(like='count:').groupby(keys).sum()
+    cols = [c[len('sum:'):] for c in sums.columns]
+    means = sums.to_numpy() / counts.to_numpy()
+    return pd.DataFrame(means, index=sums.index, columns=cols)
+
+
+def summarize(state, period, labels=None):
+    """Summary table for ``period`` from the state, optionally only for some bucket labels."""
+    if period == 'seasonal':
+        keys = pd.Index(state['SEASONS'], name='SEASONS')
+    else:
+        keys = pd.Index(_period_labels(state['DATE'], period), name='DATETIME')
+    if labels is not None:
+        mask = keys.isin(labels)
+        state, keys = state[mask], keys[mask]
+    return _means(state, keys).sort_index()
+
+
+def station_summarize(state, period, labels=None):
+    """Station x ``period`` table (yearly or monthly) of mean, count and 95% CI bounds."""
+    keys = [
+        pd.Index(state['STATION'], name='STATION'),
+        pd.Index(_period_labels(state['DATE'], period), name='DATETIME'),
+    ]
+    if labels is not None:
+        mask = keys[1].isin(labels)
+        state, keys = state[mask], [k[mask] for k in keys]
+    cols = [c for c in CI_COLS if f'sumsq:{c}' in state.columns]
+    grouped = state[[f'{stat}:{c}' for c in cols for stat in ('sum', 'sumsq', 'count')]].groupby(keys).sum()
+    table = pd.DataFrame(index=grouped.index)
+    for c in cols:
+        n = grouped[f'count:{c}']
+        mean = grouped[f'sum:{c}'] / n
+        # Sample variance from the running sums; undefined for a single reading
+        var = (grouped[f'sumsq:{c}'] - n * mean ** 2).clip(lower=0) / (n - 1)
+        half = CI_Z * np.sqrt(var / n)
+        table[c] = mean
+        table[f'{c}_count'] = n.astype('int64')
+        table[f'{c}_ci_low'] = mean - half
+        table[f'{c}_ci_high'] = mean + half
+    return table.sort_index()
+
+
+def accumulate_cube(df):
+    """Reduce hourly rows to sums and counts per (station, weekday, hour); Monday is 0."""
+    cols = [c for c in SUMMARY_COLS if c in df.columns and c != 'NO']
+    index = pd.DatetimeIndex(df.index)
+    keys = [
+        df['STATION'].astype(str).rename('STATION'),
+        pd.Series(index.dayofweek, index=df.index, name='WEEKDAY'),
+        pd.Series(index.hour, index=df.index, name='HOUR'),
+    ]
+    agg = df[cols].astype('float64').groupby(keys).agg(['sum', 'count'])
+    agg.columns = [f'{stat}:{col}' for col, stat in agg.columns]
+    return agg.reset_index()
+
+
+def merge_cube(cube, new):
+    if cube is None or cube.empty:
+        return new
+    merged = pd.concat([cube, new], ignore_index=True)
+    return merged.groupby(CUBE_KEYS, as_index=False).sum()
+
+
+def pattern_summarize(cube, table):
+    """Mean of every column over the index levels of one of PATTERN_TABLES."""
+    keys = [pd.Index(cube[k], name=k) for k in PATTERN_TABLES[table]]
+    return _means(cube, keys).sort_index()
+
+
+def load_cube(out_dir=None):
+    path = _path(CUBE_FILE, out_dir)
+    if not os.path.exists(path):
+        return None
+    return pd.read_feather(path)
+
+
+def save_cube(cube, out_dir=None):
+    path = _path(CUBE_FILE, out_dir)
+    tmp_path = path + '.tmp'
+    cube.reset_index(drop=True).to_feather(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _write_patterns(cube, out_dir):
+    written = {}
+    for table in PATTERN_TABLES:
+        path = os.path.join(out_dir, f'{table}_summary.csv')
+        pattern_summarize(cube, table).to_csv(path)
+        written[table] = path
+    return written
+
+
+def load_state(out_dir=None):
+    path = _path(STATE_FILE, out_dir)
+    if not os.path.exists(path):
+        return None
+    return pd.read_feather(path)
+
+
+def load_meta(out_dir=None):
+    """{'version', 'folded': {station: latest folded hour}}, or None if never written."""
+    path = _path(META_FILE, out_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_meta(folded, out_dir=None):
+    meta = {'version': SUMMARY_VERSION,
+            'folded': {station: str(t) for station, t in sorted(folded.items())}}
+    path = _path(META_FILE, out_dir)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _latest_hours(df):
+    """Latest hour of ``df`` per station."""
+    hours = pd.Series(df.index, index=df['STATION'].astype(str).to_numpy())
+    return {station: pd.Timestamp(t) for station, t in hours.groupby(level=0).max().items()}
+
+
+def _unfolded(new_rows, folded):
+    """The rows of ``new_rows`` later than the latest hour folded in for their station."""
+    marks = new_rows['STATION'].astype(str).map(
+        {station: pd.Timestamp(t) for station, t in folded.items()}
+    )
+    marks = pd.to_datetime(marks).to_numpy()
+    times = pd.DatetimeIndex(new_rows.index).to_numpy()
+    return new_rows[pd.isna(marks) | (times > marks)]
+
+
+def save_state(state, out_dir=None):
+    path = _path(STATE_FILE, out_dir)
+    tmp_path = path + '.tmp'
+    state.reset_index(drop=True).to_feather(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _write(table, period, out_dir, prefix=''):
+    path = os.path.join(out_dir, f'{prefix}{period}_summary.csv')
+    if period == 'seasonal':
+        table.to_csv(path)
+    else:
+        table.to_csv(path, date_format='%Y-%m-%d')
+    return path
+
+
+def _from_eda(kind):
+    """accumulate() ('state') or accumulate_cube() ('cube') of the EDA frame,
+    kept until the EDA data changes."""
+    sig = data.signature('merged_data_eda')
+    with _derived_lock:
+        hit = _derived.get(kind)
+        if hit is None or hit[0] != sig:
+            reduce = accumulate if kind == 'state' else accumulate_cube
+            hit = (sig, reduce(data.load_eda()))
+            _derived[kind] = hit
+        return hit[1]
+
+
+def load_pattern_summary(table, columns=None):
+    """Pattern table (hour_station or weekday_hour), optionally only some columns;
+    derived from the EDA frame if it was never built."""
+    try:
+        frame = data.load(f'{table}_summary')
+    except FileNotFoundError:
+        frame = pattern_summarize(_from_eda('cube'), table)
+    return frame if columns is None else frame[columns]
+
+
+def load_station_summary(period):
+    """Station x ``period`` table, derived from the EDA frame if it was never built."""
+    try:
+        return data.load_station_summary(period)
+    except FileNotFoundError:
+        return station_summarize(_from_eda('state'), period)
+
+
+def build_summaries(df=None, out_dir=None):
+    """Full rebuild of every summary table (and the running-sum state) from the EDA frame."""
+    if df is None:
+        df = data.load_eda()
+    out_dir = out_dir or data.DATA_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    state = accumulate(df)
+    save_state(state, out_dir)
+    written = {period: _write(summarize(state, period), period, out_dir) for period in PERIODS}
+    for period in STATION_PERIODS:
+        written[f'station_{period}'] = _write(
+            station_summarize(state, period), period, out_dir, prefix='station_'
+        )
+    cube = accumulate_cube(df)
+    save_cube(cube, out_dir)
+    save_meta(_latest_hours(df), out_dir)
+    written.update(_write_patterns(cube, out_dir))
+    return written
+
+
+def update_summaries(new_rows, out_dir=None):
+    """Fold hours not yet summarized into the state and rewrite only the affected buckets.
+
+    Rows at or before the latest hour already folded in for their station are
+    skipped. A missing state, or one written by an older SUMMARY_VERSION, is
+    first rebuilt from the EDA frame.
+    """
+    out_dir = out_dir or data.DATA_DIR
+    meta = load_meta(out_dir)
+    state, cube = load_state(out_dir), load_cube(out_dir)
+    if state is None or cube is None or meta is None or meta.get('version') != SUMMARY_VERSION:
+        build_summaries(out_dir=out_dir)
+        meta, state, cube = load_meta(out_dir), load_state(out_dir), load_cube(out_dir)
+    new_rows = _unfolded(new_rows, meta['folded'])
+    if new_rows.empty:
+        return {}
+    new = accumulate(new_rows)
+    state = merge_state(state, new)
+    save_state(state, out_dir)
+
+    written = {}
+    for period in PERIODS:
+        if period == 'seasonal':
+            affected = pd.Index(new['SEASONS'].unique())
+        else:
+            affected = pd.Index(_period_labels(new['DATE'], period).unique())
+        fresh = summarize(state, period, labels=affected)
+        file_name, kwargs = data.DATASETS[f'{period}_summary']
+        table = pd.read_csv(os.path.join(out_dir, file_name), **kwargs)
+        table = pd.concat([table.drop(index=affected, errors='ignore'), fresh]).sort_index()
+        written[period] = _write(table[fresh.columns], period, out_dir)
+
+    for period in STATION_PERIODS:
+        affected = pd.Index(_period_labels(new['DATE'], period).unique())
+        fresh = station_summarize(state, period, labels=affected)
+        file_name, kwargs = data.DATASETS[f'station_{period}_summary']
+        table = pd.read_csv(os.path.join(out_dir, file_name), **kwargs)
+        stale = table.index.get_level_values('DATETIME').isin(affected)
+        table = pd.concat([table[~stale], fresh]).sort_index()
+        written[f'station_{period}'] = _write(
+            table[fresh.columns], period, out_dir, prefix='station_'
+        )
+
+    # The pattern tables have at most a few hundred rows; rewrite them whole
+    cube = merge_cube(cube, accumulate_cube(new_rows))
+    save_cube(cube, out_dir)
+    folded = {station: pd.Timestamp(t) for station, t in meta['folded'].items()}
+    for station, t in _latest_hours(new_rows).items():
+        folded[station] = max(t, folded.get(station, t))
+    save_meta(folded, out_dir)
+    written.update(_write_patterns(cube, out_dir))
+    return written
+
+
+if __name__ == '__main__':
+    for period, path in build_summaries().items():
+        print(f"{period:<10} -> {path}")
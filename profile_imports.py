@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Cold-start import profile of the dashboard pages. Each page module is
+# imported in a fresh interpreter (after Streamlit, which every page needs
+# anyway) with -X importtime, so the report shows what selecting that page
+# for the first time costs and which packages dominate it.
+#
+#   python profile_imports.py [--repeat 3] [--top 5] [--json report.json]
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MARKER = '--- page import ---'
+
+_PROBE = f"""
+import sys, time
+t0 = time.perf_counter()
+import streamlit
+t1 = time.perf_counter()
+sys.stderr.write({MARKER!r} + '\\n'); sys.stderr.flush()
+import importlib
+importlib.import_module(sys.argv[1])
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t1)
+"""
+
+
+def _app_pages():
+    # app.py only defines PAGES and main() at import time
+    sys.path.insert(0, BASE_DIR)
+    from app import PAGES
+    return PAGES
+
+
+def _top_packages(importtime_log, top):
+    """Heaviest top-level packages imported after the marker, by summed self time."""
+    lines = importtime_log.split(MARKER, 1)[-1].splitlines()
+    totals = {}
+    for line in lines:
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        # Self times add up to the whole import without double counting, so
+        # every package is charged for its own modules only
+        root = name.strip().split('.')[0]
+        totals[root] = totals.get(root, 0) + int(self_us)
+    ranked = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return [{'package': name, 'ms': round(us / 1000, 1)} for name, us in ranked]
+
+
+def profile_page(module, repeat=3, top=5):
+    streamlit_s, page_s, packages = [], [], None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', _PROBE, module],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        )
+        st_time, page_time = map(float, proc.stdout.split())
+        streamlit_s.append(st_time)
+        page_s.append(page_time)
+        packages = packages or _top_packages(proc.stderr, top)
+    return {
+        'module': module,
+        'streamlit_ms': round(statistics.median(streamlit_s) * 1000, 1),
+        'page_ms': round(statistics.median(page_s) * 1000, 1),
+        'top_packages': packages,
+    }
+
+
+def profile(repeat=3, top=5):
+    return {label: profile_page(module, repeat, top) for label, module in _app_pages().items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Per-page cold import time report")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per page (median is reported)")
+    parser.add_argument('--top', type=int, default=5, help="heaviest packages listed per page")
+    parser.add_argument('--json', help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = profile(args.repeat, args.top)
+    for label, row in report.items():
+        heavy = ', '.join(f"{p['package']} {p['ms']:.0f}ms" for p in row['top_packages'])
+        print(f"{row['module']:<26} {row['page_ms']:>8.1f} ms   ({heavy})")
+    print(f"{'streamlit (baseline)':<26} {statistics.median(r['streamlit_ms'] for r in report.values()):>8.1f} ms")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=1)
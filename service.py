@@ -0,0 +1,196 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+from my_utils import models, predict
+
+# Headless prediction service: serves the Models/*_best.pkl pipelines over a
+# local HTTP/JSON API without importing Streamlit. Predictions go through
+# my_utils/predict.py, so they are identical to the dashboard's.
+#
+#   GET  /health
+#   GET  /models
+#   POST /predict        {"model": "Ridge", "reading": {"PM2.5": 35.0, ...}}
+#   POST /predict/batch  {"model": "Ridge", "readings": [{...}, {...}]}
+#
+# Single-reading requests are micro-batched: requests arriving within a short
+# window are scored together in one vectorized call per model.
+
+
+class MicroBatcher:
+    def __init__(self, window_ms=5.0, max_batch=256):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, model_name, reading):
+        future = Future()
+        self._queue.put((model_name, reading, future))
+        return future
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(items) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            by_model = {}
+            for item in items:
+                by_model.setdefault(item[0], []).append(item)
+            for model_name, group in by_model.items():
+                try:
+                    frame = pd.DataFrame([reading for _, reading, _ in group])
+                    result = predict.predict_batch(frame, model_name)
+                except Exception as exc:
+                    for _, _, future in group:
+                        future.set_exception(exc)
+                    continue
+                for (_, _, future), row in zip(group, _records(result)):
+                    future.set_result(row)
+
+
+def _records(result):
+    return [
+        {'AQI': float(aqi), 'AQI_Category': None if pd.isna(cat) else str(cat)}
+        for aqi, cat in zip(result['AQI_pred'], result['AQI_Category_pred'])
+    ]
+
+
+def _check_reading(reading, where="'reading'"):
+    """Reject a reading the batch would otherwise quietly fill with medians."""
+    if not isinstance(reading, dict) or not reading:
+        raise ValueError(f"{where} must be a non-empty object of feature values")
+    names = predict.feature_names()
+    for key, value in reading.items():
+        if key in predict.CODE_SOURCES.values():
+            # Raw categorical column, encoded the same way as in training
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f"{where}: {key!r} must be a string")
+        elif key in names:
+            if value is not None and (isinstance(value, bool)
+                                      or not isinstance(value, (int, float))):
+                raise ValueError(f"{where}: {key!r} must be a number")
+        else:
+            raise ValueError(
+                f"{where}: unknown feature {key!r}; expected: {', '.join(names)}"
+            )
+    return reading
+
+
+def _model_name(payload):
+    name = payload.get('model', models.DEFAULT_MODEL)
+    if name not in models.available_models():
+        raise ValueError(
+            f"Unknown model {name!r}; available: {', '.join(models.available_models())}"
+        )
+    return name
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    batcher = None
+    request_timeout = 30.0
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if not isinstance(payload, dict):
+            raise ValueError("Request body must be a JSON object")
+        return payload
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {'status': 'ok'})
+        elif self.path == '/models':
+            self._send(200, {
+                'models': models.available_models(),
+                'features': predict.feature_names(),
+                'input_features': predict.INPUT_FEATURES,
+                'category_bins': predict.CATEGORY_BINS,
+                'category_labels': predict.CATEGORY_LABELS,
+            })
+        else:
+            self._send(404, {'error': f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        try:
+            payload = self._read_json()
+            model_name = _model_name(payload)
+            if self.path == '/predict':
+                # Checked here: once batched, a bad reading no longer fails on its own
+                reading = _check_reading(payload.get('reading'))
+                missing, _ = predict.check_columns(pd.DataFrame([reading]))
+                row = self.batcher.submit(model_name, reading).result(self.request_timeout)
+                self._send(200, {'model': model_name, 'filled_with_median': missing, **row})
+            elif self.path == '/predict/batch':
+                readings = payload.get('readings')
+                if not isinstance(readings, list) or not readings:
+                    raise ValueError("'readings' must be a non-empty list of objects")
+                for i, reading in enumerate(readings):
+                    _check_reading(reading, f"'readings'[{i}]")
+                frame = pd.DataFrame(readings)
+                missing, _ = predict.check_columns(frame)
+                result = predict.predict_batch(frame, model_name)
+                self._send(200, {
+                    'model': model_name,
+                    'filled_with_median': missing,
+                    'predictions': _records(result),
+                })
+            else:
+                self._send(404, {'error': f"Unknown path {self.path}"})
+        except (ValueError, TypeError, KeyError) as exc:
+            self._send(400, {'error': str(exc)})
+        except Exception as exc:
+            self._send(500, {'error': str(exc)})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host='127.0.0.1', port=8502, window_ms=5.0, max_batch=256, warm=None):
+    # Load pipelines and training medians before accepting traffic
+    models.warm_up(warm or models.available_models(), background=False)
+    predict.feature_medians()
+
+    PredictionHandler.batcher = MicroBatcher(window_ms, max_batch)
+    server = ThreadingHTTPServer((host, port), PredictionHandler)
+    print(f"Serving AQI predictions on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Headless AQI prediction service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--batch-window-ms', type=float, default=5.0,
+                        help="how long a single prediction waits for others to batch with")
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--warm', nargs='*', default=None,
+                        help="models to preload (default: all)")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.batch_window_ms, args.max_batch, args.warm)
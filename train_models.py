@@ -0,0 +1,359 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+# Training harness for the modeling page: refits the scaler, the SelectKBest
+# selector and the six tuned models from merged_data_eda, then writes
+#
+#   Models/scaler.pkl, Models/selector.pkl, Models/<name>_best.pkl
+#   Data_set/model_performance_tuned.csv   (Train_Time_s, R2, RMSE, MAE, MAPE_%)
+#   Data_set/model_predictions_tuned.csv   (Actual and <name>_Pred on the test rows)
+#   Models/manifest.json                   (parameters, metrics, latency, size)
+#
+# Only a full run (all six models, no --sample) refits the scaler and selector.
+# Partial and sampled runs reuse the ones in Models/ so the models they leave
+# alone stay valid. When the scaler and selector are refitted, any other
+# *_best.pkl is deleted. The manifest records a fingerprint of the scaler and
+# selector for each model, and models.get_pipeline() refuses a model whose
+# fingerprint does not match.
+#
+# Each model is tuned by successive halving (HalvingGridSearchCV): every
+# candidate starts on a small share of the training rows and only the best
+# third goes on to the next, larger round. Candidates and folds run in
+# parallel on --jobs cores. Splits, searches and models are seeded, so a run
+# on the same data reproduces the same artifacts.
+#
+#   python train_models.py [--jobs -1] [--models Ridge SVR] [--sample 50000]
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+MODEL_DIR = os.path.join(BASE_DIR, 'Models')
+DATA_DIR = os.path.join(BASE_DIR, 'Data_set')
+
+SEED = 42
+TEST_SIZE = 0.2
+K_BEST = 10
+CV_FOLDS = 3
+HALVING_FACTOR = 3
+TARGET = 'AQI'
+
+# Scaler input columns, in the order the dashboard's pipelines expect them
+FEATURES = [
+    'PM2.5', 'PM10', 'SO2', 'NO2', 'CO', 'O3', 'TEMP', 'PRES', 'DEWP', 'RAIN',
+    'WSPM', 'Vehicular_Pollution', 'Industrial_Pollution',
+    'WD_code', 'STATION_code', 'AQI_Category_code', 'SEASONS_code',
+]
+
+# Model order of the performance and prediction tables
+MODEL_NAMES = ['Ridge', 'DecisionTree', 'RandomForest', 'GradientBoosting', 'SVR', 'KNeighbors']
+
+# Kernel SVR scales quadratically with the rows it is fitted on, so it is
+# tuned and refitted on a seeded subsample of the training rows
+MAX_FIT_ROWS = {'SVR': 10_000}
+
+LATENCY_CALLS = 50
+
+
+def _estimators():
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    from sklearn.linear_model import Ridge
+    from sklearn.neighbors import KNeighborsRegressor
+    from sklearn.svm import SVR
+    from sklearn.tree import DecisionTreeRegressor
+
+    # name -> (estimator, parameter grid)
+    return {
+        'Ridge': (Ridge(), {'alpha': [0.01, 0.1, 1.0, 10.0, 100.0]}),
+        'DecisionTree': (
+            DecisionTreeRegressor(random_state=SEED),
+            {'max_depth': [5, 10, 20, None], 'min_samples_leaf': [1, 5, 20]},
+        ),
+        'RandomForest': (
+            RandomForestRegressor(n_estimators=100, random_state=SEED, n_jobs=1),
+            {'max_depth': [10, 20, None], 'min_samples_leaf': [1, 5], 'max_features': [0.5, 1.0]},
+        ),
+        # Each candidate stops adding trees once 10 rounds in a row fail to
+        # improve on a held-out 10% of its training rows
+        'GradientBoosting': (
+            GradientBoostingRegressor(
+                n_estimators=500, validation_fraction=0.1, n_iter_no_change=10,
+                random_state=SEED
+            ),
+            {'max_depth': [3, 5, 7], 'learning_rate': [0.05, 0.1, 0.2]},
+        ),
+        'SVR': (SVR(cache_size=1000), {'C': [1.0, 10.0, 100.0], 'epsilon': [0.1, 1.0]}),
+        'KNeighbors': (
+            KNeighborsRegressor(),
+            {'n_neighbors': [3, 5, 10, 20], 'weights': ['uniform', 'distance']},
+        ),
+    }
+
+
+# --- data ------------------------------------------------------------------
+
+def load_training_frame(sample=None):
+    """(X, y) from merged_data_eda: FEATURES (category codes included) and AQI."""
+    import pandas as pd
+    from my_utils import data, features
+
+    df = data.load_eda()
+    if sample is not None and sample < len(df):
+        df = df.sample(n=sample, random_state=SEED)
+    codes = features.encode(df)
+    X = pd.DataFrame(
+        {c: (codes[c] if c in codes else df[c]).astype('float64') for c in FEATURES},
+        index=df.index
+    )
+    return X, df[TARGET].astype('float64')
+
+
+def _subsample(X, y, rows):
+    if rows is None or len(X) <= rows:
+        return X, y
+    keep = X.sample(n=rows, random_state=SEED).index
+    return X.loc[keep], y.loc[keep]
+
+
+# --- training --------------------------------------------------------------
+
+def load_preprocessing(model_dir):
+    """The scaler and selector already in ``model_dir``, or None if either is missing."""
+    import joblib
+
+    paths = [os.path.join(model_dir, f'{n}.pkl') for n in ('scaler', 'selector')]
+    if not all(os.path.exists(p) for p in paths):
+        return None
+    scaler, selector = (joblib.load(p) for p in paths)
+    if list(scaler.feature_names_in_) != FEATURES:
+        raise ValueError(
+            f"{paths[0]} was fitted on different features; run a full train_models.py "
+            "(all models, no --sample) to refit it"
+        )
+    return scaler, selector
+
+
+def fit_preprocessing(X_train, y_train):
+    """StandardScaler and SelectKBest(f_regression, k=K_BEST) fitted on the training rows."""
+    from sklearn.feature_selection import SelectKBest, f_regression
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler().fit(X_train)
+    scaled = scaler.transform(X_train)
+    selector = SelectKBest(f_regression, k=K_BEST).fit(scaled, y_train)
+    return scaler, selector
+
+
+def tune(name, Z_train, y_train, jobs=-1, verbose=0):
+    """Successive-halving search for ``name`` on the selected features; returns the fitted search."""
+    from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+    from sklearn.model_selection import HalvingGridSearchCV, KFold
+
+    estimator, grid = _estimators()[name]
+    search = HalvingGridSearchCV(
+        estimator, grid,
+        factor=HALVING_FACTOR,
+        resource='n_samples',
+        cv=KFold(CV_FOLDS, shuffle=True, random_state=SEED),
+        scoring='neg_root_mean_squared_error',
+        refit=True,
+        n_jobs=jobs,
+        random_state=SEED,
+        verbose=verbose,
+    )
+    return search.fit(Z_train, y_train)
+
+
+def metrics(actual, pred):
+    """R2, RMSE, MAE and MAPE_% (MAPE over rows with a non-zero actual AQI)."""
+    import numpy as np
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    actual, pred = np.asarray(actual), np.asarray(pred)
+    nonzero = actual != 0
+    return {
+        'R2': float(r2_score(actual, pred)),
+        'RMSE': float(np.sqrt(mean_squared_error(actual, pred))),
+        'MAE': float(mean_absolute_error(actual, pred)),
+        'MAPE_%': float(np.mean(np.abs((actual[nonzero] - pred[nonzero]) / actual[nonzero])) * 100),
+    }
+
+
+def latency(pipeline, X_test, calls=LATENCY_CALLS):
+    """Single-row median latency and whole-test-set throughput of the full pipeline."""
+    one = X_test.iloc[:1]
+    pipeline.predict(one)
+    single = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        pipeline.predict(one)
+        single.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    pipeline.predict(X_test)
+    batch_s = time.perf_counter() - start
+    return {
+        'single_ms': round(statistics.median(single) * 1000, 3),
+        'batch_rows_per_s': round(len(X_test) / batch_s, 1),
+    }
+
+
+# --- output ----------------------------------------------------------------
+
+def _dump(obj, path):
+    import joblib
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        joblib.dump(obj, f)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def _write_csv(df, path, index=True):
+    tmp_path = path + '.tmp'
+    df.to_csv(tmp_path, index=index)
+    os.replace(tmp_path, path)
+
+
+def _merge_tables(perf, preds, data_dir, keep):
+    """Fold the models trained now into the existing tables (for --models runs).
+
+    Earlier rows are kept only for the models in ``keep``, and only if their
+    predictions were made on the same test rows.
+    """
+    import numpy as np
+    import pandas as pd
+
+    perf_path = os.path.join(data_dir, 'model_performance_tuned.csv')
+    pred_path = os.path.join(data_dir, 'model_predictions_tuned.csv')
+    if os.path.exists(perf_path) and os.path.exists(pred_path):
+        old_preds = pd.read_csv(pred_path)
+        if len(old_preds) == len(preds['Actual']) and np.allclose(old_preds['Actual'], preds['Actual']):
+            old_perf = pd.read_csv(perf_path, index_col=0)
+            old_perf = old_perf[old_perf.index.isin(keep)]
+            perf = {**old_perf.to_dict(orient='index'), **perf}
+            preds = {**old_preds.to_dict(orient='series'), **preds}
+    order = [n for n in MODEL_NAMES if n in perf and f'{n}_Pred' in preds]
+    perf = pd.DataFrame.from_dict(perf, orient='index').loc[order]
+    preds = pd.DataFrame({c: np.asarray(preds[c]) for c in ['Actual'] + [f'{n}_Pred' for n in order]})
+    return perf, preds
+
+
+def train(names=MODEL_NAMES, jobs=-1, sample=None, model_dir=MODEL_DIR, data_dir=DATA_DIR,
+          verbose=0):
+    """Fit everything, write the artifacts and return the manifest."""
+    import sklearn
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import Pipeline
+    from my_utils import data, models
+
+    os.makedirs(model_dir, exist_ok=True)
+    os.makedirs(data_dir, exist_ok=True)
+
+    X, y = load_training_frame(sample)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=TEST_SIZE, random_state=SEED
+    )
+    full_run = set(names) == set(MODEL_NAMES) and sample is None
+    reused = None if full_run else load_preprocessing(model_dir)
+    if reused is not None:
+        scaler, selector = reused
+    else:
+        scaler, selector = fit_preprocessing(X_train, y_train)
+        _dump(scaler, os.path.join(model_dir, 'scaler.pkl'))
+        _dump(selector, os.path.join(model_dir, 'selector.pkl'))
+        # Models not retrained here were stacked on the old scaler/selector
+        for path in glob.glob(os.path.join(model_dir, '*_best.pkl')):
+            if os.path.basename(path)[:-len('_best.pkl')] not in names:
+                os.remove(path)
+                print(f"Removed {path} (fitted on the previous scaler/selector)")
+    fingerprint = models.preprocessing_fingerprint(model_dir)
+    kept = [os.path.basename(p)[:-len('_best.pkl')]
+            for p in glob.glob(os.path.join(model_dir, '*_best.pkl'))]
+    selected = [c for c, keep in zip(FEATURES, selector.get_support()) if keep]
+    print(f"{len(X_train):,} training / {len(X_test):,} test rows; selected: {', '.join(selected)}")
+
+    mtime_ns, size = data.signature('merged_data_eda')
+    manifest = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'source': {'file': data.DATASETS['merged_data_eda'][0], 'mtime_ns': mtime_ns,
+                   'size': size, 'sample': sample},
+        'python': platform.python_version(),
+        'sklearn': sklearn.__version__,
+        'seed': SEED,
+        'test_size': TEST_SIZE,
+        'train_rows': len(X_train),
+        'test_rows': len(X_test),
+        'features': FEATURES,
+        'selected_features': selected,
+        'preprocessing': fingerprint,
+        'models': {},
+    }
+    perf = {}
+    preds = {'Actual': y_test.to_numpy()}
+    for name in names:
+        fit_X, fit_y = _subsample(X_train, y_train, MAX_FIT_ROWS.get(name))
+        Z_train = selector.transform(scaler.transform(fit_X))
+        start = time.perf_counter()
+        search = tune(name, Z_train, fit_y, jobs, verbose)
+        train_s = time.perf_counter() - start
+
+        model = search.best_estimator_
+        size_bytes = _dump(model, os.path.join(model_dir, f'{name}_best.pkl'))
+        pipeline = Pipeline([('scaler', scaler), ('selector', selector), ('model', model)])
+        pred = pipeline.predict(X_test)
+        scores = metrics(y_test, pred)
+        perf[name] = {'Train_Time_s': train_s, **scores}
+        preds[f'{name}_Pred'] = pred
+        manifest['models'][name] = {
+            'artifact': f'{name}_best.pkl',
+            'preprocessing': fingerprint,
+            'params': {k: v for k, v in search.best_params_.items()},
+            'cv_rmse': float(-search.best_score_),
+            'candidates': int(search.n_candidates_[0]),
+            'halving_rounds': int(search.n_iterations_),
+            'fit_rows': len(fit_X),
+            'train_s': round(train_s, 3),
+            'refit_s': round(search.refit_time_, 3),
+            **scores,
+            **latency(pipeline, X_test),
+            'size_kb': round(size_bytes / 1024, 1),
+        }
+        print(f"{name:<18} R2 {scores['R2']:.4f}  RMSE {scores['RMSE']:7.2f}  "
+              f"{train_s:7.1f}s  {search.best_params_}")
+
+    perf, preds = _merge_tables(perf, preds, data_dir, kept)
+    _write_csv(perf, os.path.join(data_dir, 'model_performance_tuned.csv'))
+    _write_csv(preds, os.path.join(data_dir, 'model_predictions_tuned.csv'), index=False)
+
+    path = os.path.join(model_dir, 'manifest.json')
+    if os.path.exists(path):
+        with open(path) as f:
+            earlier = json.load(f).get('models', {})
+        manifest['models'] = {
+            n: manifest['models'].get(n, earlier.get(n)) for n in perf.index
+            if n in manifest['models'] or n in earlier
+        }
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, default=str)
+    os.replace(path + '.tmp', path)
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Refit the scaler, selector and tuned models")
+    parser.add_argument('--models', nargs='+', default=MODEL_NAMES, choices=MODEL_NAMES)
+    parser.add_argument('--jobs', type=int, default=-1, help="parallel search workers (-1 = all cores)")
+    parser.add_argument('--sample', type=int, help="train on a seeded sample of this many rows")
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--verbose', type=int, default=0)
+    args = parser.parse_args()
+
+    train(args.models, args.jobs, args.sample, args.model_dir, args.data_dir, args.verbose)
+    print(f"Wrote {os.path.join(args.model_dir, 'manifest.json')}")